@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from steganographer import Steganographer
+from image_files import LOSSLESS_EXTENSIONS, MAPPED_EXTENSIONS, find_images, available_cores
+
+
+def read_manifest(path):
+    """
+    Читает манифест в формате JSON lines: по одному заданию (объекту) на строку.
+    Некорректная строка не прерывает чтение: вместо задания сохраняется описание ошибки,
+    которое попадет в журнал как результат с ошибкой.
+    """
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                entry = {'error': f"Строка {number} манифеста: {e}"}
+            if not isinstance(entry, dict):
+                entry = {'error': f"Строка {number} манифеста: ожидается объект JSON"}
+            jobs.append(entry)
+    return jobs
+
+
+def output_path_for(image_path, output_dir, suffix, keep_extension=False):
+    """
+    Путь результата: имя исходного файла с новым суффиксом; JPEG заменяется на PNG.
+    При keep_extension расширение исходного файла сохраняется в имени (a.jpg -> a_jpg.png).
+    """
+    stem, ext = os.path.splitext(os.path.basename(image_path))
+    if suffix is None:
+        suffix = ext if ext.lower() in LOSSLESS_EXTENSIONS else '.png'
+    if keep_extension and ext:
+        stem += '_' + ext[1:].lower()
+    return os.path.join(output_dir, stem + suffix)
+
+
+def check_job(job, required):
+    """Проверяет задание перед выполнением; ошибка манифеста или недостающее поле — ValueError"""
+    if 'error' in job:
+        raise ValueError(job['error'])
+    missing = [key for key in required if not job.get(key)]
+    if missing:
+        raise ValueError(f"В задании нет обязательных полей: {', '.join(missing)}")
+
+
+def embed_job(job):
+    """Встраивает сообщение в один контейнер; ошибки возвращаются в результате, а не выбрасываются"""
+    result = {'cover': job.get('cover'), 'output': job.get('output'), 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        check_job(job, ('cover', 'output', 'payload'))
+        with open(job['payload'], 'r', encoding='utf-8') as file:
+            message = file.read()
+        method, seed, k = job['method'], job['seed'], job['k']
+
+        # Несжатые контейнеры встраиваются через memmap без полного декодирования
+        stego = None
+        ext = os.path.splitext(job['cover'])[1].lower()
+        if ext in MAPPED_EXTENSIONS and os.path.splitext(job['output'])[1].lower() == ext:
+            try:
+                stego = Steganographer.from_mapped(job['cover'])
+            except ValueError:
+                pass
+        if stego is None:
+            stego = Steganographer(job['cover'])
+
+        plan = stego.plan_capacity(message, method)
+        if not plan['plans'][k]['fits']:
+            raise ValueError(f"Сообщение не помещается при k = {k}, минимальное k: {plan['min_k']}")
+
+        # Отладочный вывод embed_enhanced не нужен в пакетном режиме
+        with contextlib.redirect_stdout(io.StringIO()):
+            if stego.mapped_path is not None:
+                stego.embed_to_file(message, seed, job['output'], method, k)
+            elif method == "basic":
+                stego.embed_basic(message, seed, k).save(job['output'])
+            else:
+                stego.embed_enhanced(message, seed, k).save(job['output'])
+        result['bits'] = plan['required_bits']
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def extract_job(job):
+    """Извлекает сообщение из одного стегоконтейнера и сохраняет его в текстовый файл"""
+    result = {'stego': job.get('stego'), 'output': job.get('output'), 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        check_job(job, ('stego', 'output'))
+        stego = Steganographer(job['stego'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            if job['method'] == "basic":
+                if not job.get('length_bits'):
+                    raise ValueError("Для базового метода нужна длина сообщения в битах (length_bits)")
+                text = stego.extract_basic(job['seed'], job['length_bits'], job['k'])
+            else:
+                text, block_ok = stego.extract_enhanced(job['seed'], job['k'])
+                result['blocks'] = int(block_ok.size)
+                result['bad_blocks'] = int((~block_ok).sum())
+        with open(job['output'], 'w', encoding='utf-8') as file:
+            file.write(text)
+        result['chars'] = len(text)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def build_jobs(args):
+    """
+    Формирует список заданий из манифеста или папки с изображениями.
+    Если автоматические имена результатов совпадают (a.png и a.jpg -> a.png), в имена
+    файлов, у которых расширение меняется, добавляется исходное расширение; оставшиеся
+    совпадения (в том числе явные пути манифеста) помечаются ошибкой, чтобы два процесса
+    не писали в один файл.
+    """
+    defaults = {'method': args.method, 'seed': args.seed, 'k': args.k}
+    input_key = 'cover' if args.command == 'embed' else 'stego'
+    suffix = None if args.command == 'embed' else '.txt'
+    if args.manifest:
+        jobs = [dict(defaults, **entry) for entry in read_manifest(args.manifest)]
+    else:
+        jobs = [dict(defaults, **{input_key: path}) for path in find_images(args.input)]
+
+    automatic = {}
+    for number, job in enumerate(jobs):
+        if args.command == 'embed':
+            job.setdefault('payload', args.payload)
+        else:
+            job.setdefault('length_bits', args.length_bits)
+        if 'output' not in job and job.get(input_key):
+            job['output'] = output_path_for(job[input_key], args.output, suffix)
+            automatic[number] = job['output']
+
+    def output_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    claimed = {}
+    for job in jobs:
+        if job.get('output'):
+            claimed[output_key(job['output'])] = claimed.get(output_key(job['output']), 0) + 1
+    for number, output in automatic.items():
+        job = jobs[number]
+        if claimed[output_key(output)] > 1 and \
+                os.path.splitext(job[input_key])[1].lower() != os.path.splitext(output)[1].lower():
+            job['output'] = output_path_for(job[input_key], args.output, suffix, keep_extension=True)
+
+    owners = {}
+    for job in jobs:
+        if 'error' in job or not job.get('output'):
+            continue
+        key = output_key(job['output'])
+        if key in owners:
+            job['error'] = f"Результат {job['output']} уже записывается заданием для {owners[key]}"
+        else:
+            owners[key] = job.get(input_key)
+    return jobs
+
+
+def run_batch(jobs, worker, log_path, workers=None):
+    """
+    Выполняет задания в пуле процессов и дописывает результаты в журнал JSON lines.
+    Возвращает число успешно обработанных заданий.
+    """
+    workers = workers or available_cores()
+    succeeded = 0
+    started = time.perf_counter()
+    with open(log_path, 'a', encoding='utf-8') as log, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            log.write(json.dumps(result, ensure_ascii=False) + "\n")
+            log.flush()
+            if result['status'] == 'ok':
+                succeeded += 1
+            else:
+                print(f"[{done}/{len(jobs)}] Ошибка: {result['error']}", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    print(f"Обработано: {succeeded}/{len(jobs)} за {elapsed:.2f} с ({workers} процессов)")
+    return succeeded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное встраивание и извлечение сообщений")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command in ('embed', 'extract'):
+        sub = subparsers.add_parser(command)
+        source = sub.add_mutually_exclusive_group(required=True)
+        source.add_argument('--input', help="папка с изображениями")
+        source.add_argument('--manifest', help="манифест заданий в формате JSON lines")
+        sub.add_argument('--output', required=True, help="папка для результатов")
+        sub.add_argument('--method', choices=['basic', 'enhanced'], default='enhanced')
+        sub.add_argument('--seed', type=int, default=12345)
+        sub.add_argument('--k', type=int, default=1, help="бит на отсчёт")
+        sub.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+        sub.add_argument('--log', default='results.jsonl', help="журнал результатов JSON lines")
+        if command == 'embed':
+            sub.add_argument('--payload', help="текстовый файл с сообщением для всех контейнеров")
+        else:
+            sub.add_argument('--length-bits', type=int, default=None, help="длина сообщения для базового метода")
+    args = parser.parse_args(argv)
+
+    if args.command == 'embed' and not args.manifest and not args.payload:
+        parser.error("без манифеста требуется --payload")
+    os.makedirs(args.output, exist_ok=True)
+
+    jobs = build_jobs(args)
+    worker = embed_job if args.command == 'embed' else extract_job
+    succeeded = run_batch(jobs, worker, args.log, args.workers)
+    return 0 if succeeded == len(jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
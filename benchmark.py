@@ -0,0 +1,121 @@
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from PIL import Image
+from steganographer import Steganographer
+from kjb import embed_kjb_array, extract_kjb_array
+
+
+def legacy_embed_basic(stego, text, seed):
+    """Прежняя реализация embed_basic: побитовый цикл с int32 и np.clip"""
+    bits = stego.text_to_bits(text)
+    key = stego.generate_key(seed, len(bits))
+    encoded = np.bitwise_xor(bits, key)
+    flat_pixels = stego.pixels.flatten().astype(np.int32)
+    for i in range(len(encoded)):
+        if i < len(flat_pixels):
+            new_value = (flat_pixels[i] & 0xFE) | encoded[i]
+            flat_pixels[i] = np.clip(new_value, 0, 255)
+    new_pixels = flat_pixels.reshape(stego.pixels.shape).astype(np.uint8)
+    return Image.fromarray(new_pixels)
+
+
+def make_cover(megapixels, seed=0):
+    """Создает случайное RGB-изображение заданного размера в мегапикселях"""
+    side = int(np.sqrt(megapixels * 1_000_000))
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (side, side, 3), dtype=np.uint8))
+
+
+def make_smooth_cover(megapixels, seed=0):
+    """Создает гладкое RGB-изображение с шумом: у случайного шума нет корреляции соседей, нужной KJB"""
+    side = int(np.sqrt(megapixels * 1_000_000))
+    y, x = np.mgrid[0:side, 0:side] / side
+    rng = np.random.default_rng(seed)
+    base = np.stack([
+        128 + 100 * np.sin(3 * x + 2 * y),
+        128 + 90 * np.cos(4 * y - x),
+        60 + 150 * x * y
+    ], axis=-1)
+    return np.clip(base + rng.normal(0, 2, base.shape), 0, 255).astype(np.uint8)
+
+
+def make_message(size_bytes, seed=0):
+    rng = np.random.default_rng(seed)
+    return ''.join(chr(c) for c in rng.integers(ord('a'), ord('z') + 1, size_bytes))
+
+
+def measure(func, repeat):
+    """Возвращает минимальное время выполнения func за repeat запусков (мс)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_embed(sizes, message_bytes, repeat, seed=12345):
+    message = make_message(message_bytes)
+    print(f"Сообщение: {message_bytes} байт, повторов: {repeat}")
+    print(f"{'МП':>6} {'до, мс':>12} {'basic, мс':>12} {'enhanced, мс':>14} {'ускорение':>10}")
+    for mp in sizes:
+        stego = Steganographer.from_image(make_cover(mp))
+        before = measure(lambda: legacy_embed_basic(stego, message, seed), repeat)
+        after = measure(lambda: stego.embed_basic(message, seed), repeat)
+        with contextlib.redirect_stdout(io.StringIO()):  # embed_enhanced печатает отладочный вывод
+            enhanced = measure(lambda: stego.embed_enhanced(message, seed), repeat)
+        print(f"{mp:>6} {before:>12.1f} {after:>12.1f} {enhanced:>14.1f} {before / after:>9.1f}x")
+
+
+def bench_kjb(lams, repeats, megapixels, message_bytes, seed=12345):
+    """Перебор λ и числа повторений r: пропускная способность и доля ошибочных бит KJB"""
+    cover = make_smooth_cover(megapixels)
+    bits = np.unpackbits(np.frombuffer(make_message(message_bytes).encode('utf-8'), dtype=np.uint8))
+    print(f"Контейнер: {megapixels} МП, сообщение: {message_bytes} байт")
+    print(f"{'λ':>6} {'r':>4} {'встр., мс':>10} {'извл., мс':>10} {'бит/с':>12} {'BER':>10}")
+    for lam in lams:
+        for r in repeats:
+            if len(bits) * r > cover.shape[0] * cover.shape[1]:
+                print(f"{lam:>6} {r:>4} {'не помещается':>46}")
+                continue
+            stego = cover.copy()
+            start = time.perf_counter()
+            embed_kjb_array(stego, bits, lam, seed, r)
+            embedded = time.perf_counter()
+            extracted = extract_kjb_array(stego, seed, repeat=r, length_bits=len(bits))
+            finished = time.perf_counter()
+
+            ber = np.count_nonzero(extracted != bits) / len(bits)
+            throughput = len(bits) / (finished - start)
+            print(f"{lam:>6} {r:>4} {(embedded - start) * 1000:>10.1f} {(finished - embedded) * 1000:>10.1f} "
+                  f"{throughput:>12.0f} {ber:>10.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности стеганографических методов")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    lsb = subparsers.add_parser('lsb', help="встраивание LSB (Steganographer)")
+    lsb.add_argument('--sizes', type=float, nargs='+', default=[1, 12, 48],
+                     help="размеры контейнеров в мегапикселях")
+    lsb.add_argument('--message-bytes', type=int, default=64 * 1024)
+    lsb.add_argument('--repeat', type=int, default=3)
+
+    kjb = subparsers.add_parser('kjb', help="KJB с повторением бит: скорость и доля ошибок")
+    kjb.add_argument('--lams', type=float, nargs='+', default=[0.01, 0.02, 0.05, 0.1, 0.2])
+    kjb.add_argument('--repeats', type=int, nargs='+', default=[1, 3, 5, 9, 15])
+    kjb.add_argument('--size', type=float, default=1, help="размер контейнера в мегапикселях")
+    kjb.add_argument('--message-bytes', type=int, default=4 * 1024)
+
+    args = parser.parse_args()
+    if args.command == 'lsb':
+        bench_embed(args.sizes, args.message_bytes, args.repeat)
+    else:
+        bench_kjb(args.lams, args.repeats, args.size, args.message_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import numpy as np
+from collections import OrderedDict
+
+
+def bit_planes(pixels: np.ndarray, bits=range(8)) -> np.ndarray:
+    """
+    Битовые плоскости массива uint8 одним сдвигом с broadcast по номерам бит.
+    :param bits: номера бит (0 — младший)
+    :return: массив формы (len(bits),) + pixels.shape со значениями 0 и 255
+    """
+    shifts = np.asarray(bits, dtype=np.uint8).reshape((-1,) + (1,) * pixels.ndim)
+    planes = np.right_shift(pixels[None], shifts)
+    planes &= 1
+    planes *= 255
+    return planes
+
+
+def channel_names(pixels: np.ndarray) -> list[str]:
+    """Подписи каналов массива: L для полутонового, R, G, B (и A) для цветного"""
+    if pixels.ndim == 2:
+        return ["L"]
+    if pixels.shape[2] in (3, 4):
+        return list("RGBA"[:pixels.shape[2]])
+    return [str(i) for i in range(pixels.shape[2])]
+
+
+def plane_source(pixels: np.ndarray, channel: int, mode: str = "plane", other: np.ndarray = None,
+                 rows=slice(None), cols=slice(None)) -> np.ndarray:
+    """
+    Значения канала в области (rows, cols), из которых берутся битовые плоскости:
+    сам канал (mode="plane") или его XOR с тем же каналом второго изображения (mode="xor").
+    """
+    def take(array):
+        region = array[rows, cols]
+        return region if region.ndim == 2 else region[..., channel]
+
+    if mode == "plane":
+        return take(pixels)
+    if mode == "xor":
+        if other is None:
+            raise ValueError("Для режима XOR нужно второе изображение")
+        return take(pixels) ^ take(other)
+    raise ValueError(f"Неизвестный режим: {mode}")
+
+
+def compute_plane(pixels: np.ndarray, channel: int, bit: int, mode: str = "plane", other: np.ndarray = None,
+                  rows=slice(None), cols=slice(None), gain: int = 64) -> np.ndarray:
+    """
+    Плоскость для отображения (значения 0..255) в области (rows, cols):
+      - "plane" — бит bit канала;
+      - "xor" — бит bit в XOR каналов двух изображений (где встраивание изменило бит);
+      - "diff" — модуль разности каналов, усиленный в gain раз (bit не используется).
+    """
+    if mode == "diff":
+        if other is None:
+            raise ValueError("Для разности нужно второе изображение")
+        first = plane_source(pixels, channel, "plane", rows=rows, cols=cols)
+        second = plane_source(other, channel, "plane", rows=rows, cols=cols)
+        difference = np.abs(first.astype(np.int16) - second)
+        return np.minimum(difference * gain, 255).astype(np.uint8)
+    return bit_planes(plane_source(pixels, channel, mode, other, rows, cols), [bit])[0]
+
+
+class TiledPlaneRenderer:
+    """
+    Отрисовка плоскостей только для видимой области и текущего масштаба.
+    Масштаб задается шагом прореживания step (1 — каждый пиксель, 4 — каждый четвертый).
+    Плоскость считается квадратными тайлами по tile_size выходных пикселей;
+    готовые тайлы хранятся в LRU-кэше, поэтому при панорамировании пересчитываются
+    только вновь открывшиеся тайлы. Массивы могут быть np.memmap.
+    """
+
+    def __init__(self, pixels: np.ndarray, other: np.ndarray = None, tile_size: int = 256, max_tiles: int = 1024):
+        self.pixels = pixels
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.other = None
+        self.set_other(other)
+
+    def set_other(self, other: np.ndarray):
+        """Второе изображение для режимов XOR и разности; кэш сбрасывается"""
+        if other is not None and other.shape != self.pixels.shape:
+            raise ValueError(f"Размеры изображений не совпадают: {self.pixels.shape} и {other.shape}")
+        self.other = other
+        self.tiles.clear()
+
+    def _tile(self, channel, bit, mode, step, ty, tx):
+        key = (channel, bit, mode, step, ty, tx)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        span = self.tile_size * step
+        rows = slice(ty * span, (ty + 1) * span, step)
+        cols = slice(tx * span, (tx + 1) * span, step)
+        tile = compute_plane(self.pixels, channel, bit, mode, self.other, rows, cols)
+        self.tiles[key] = tile
+        if len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def render(self, channel: int, bit: int, mode: str, x: int, y: int,
+               width: int, height: int, step: int = 1) -> np.ndarray:
+        """
+        Видимая область: начиная с пикселя (x, y) исходного изображения, не больше
+        width × height выходных пикселей с шагом step.
+        """
+        h, w = self.pixels.shape[:2]
+        out_h, out_w = -(-h // step), -(-w // step)
+        oy0, ox0 = min(y // step, out_h), min(x // step, out_w)
+        oy1, ox1 = min(oy0 + height, out_h), min(ox0 + width, out_w)
+
+        view = np.zeros((oy1 - oy0, ox1 - ox0), dtype=np.uint8)
+        size = self.tile_size
+        for ty in range(oy0 // size, -(-oy1 // size)):
+            for tx in range(ox0 // size, -(-ox1 // size)):
+                tile = self._tile(channel, bit, mode, step, ty, tx)
+                top, left = ty * size, tx * size
+                ys = slice(max(oy0, top), min(oy1, top + size))
+                xs = slice(max(ox0, left), min(ox1, left + size))
+                view[ys.start - oy0:ys.stop - oy0, xs.start - ox0:xs.stop - ox0] = \
+                    tile[ys.start - top:ys.stop - top, xs.start - left:xs.stop - left]
+        return view
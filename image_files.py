@@ -0,0 +1,20 @@
+import os
+
+LOSSLESS_EXTENSIONS = ('.png', '.bmp', '.pgm', '.ppm', '.tif', '.tiff')
+IMAGE_EXTENSIONS = LOSSLESS_EXTENSIONS + ('.jpg', '.jpeg')
+MAPPED_EXTENSIONS = ('.bmp', '.pgm', '.ppm')  # несжатые форматы, которые можно отобразить в память
+
+
+def find_images(folder):
+    """Возвращает отсортированный список изображений в папке"""
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+
+
+def available_cores():
+    """Число ядер, доступных процессу (с учетом привязки к процессорам, если она поддерживается)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class KeyedPermutation:
+    """
+    Ключевая псевдослучайная перестановка отрезка [0, n) без хранения всей перестановки.
+    Основа — сбалансированная сеть Фейстеля над 2^bits >= n значениями; выходы за
+    пределы [0, n) шифруются повторно (cycle walking), поэтому i-я позиция
+    перестановки вычисляется по запросу за O(1), а любой отрезок — за O(длины).
+    """
+    ROUNDS = 6
+
+    def __init__(self, n: int, seed: int):
+        if n <= 0:
+            raise ValueError("Размер перестановки должен быть положительным")
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = np.uint64((1 << self.half_bits) - 1)
+        self.round_keys = np.random.SeedSequence(seed).generate_state(self.ROUNDS, np.uint64)
+
+    def __len__(self):
+        return self.n
+
+    def _round(self, right: np.ndarray, key: np.uint64) -> np.ndarray:
+        # Финализатор splitmix64: хорошо перемешивает биты и работает поэлементно
+        z = right ^ key
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) & self.half_mask
+
+    def _encrypt(self, values: np.ndarray) -> np.ndarray:
+        shift = np.uint64(self.half_bits)
+        left, right = values >> shift, values & self.half_mask
+        for key in self.round_keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << shift) | right
+
+    def take(self, start: int, stop: int) -> np.ndarray:
+        """Позиции перестановки с номерами start..stop-1 (массив int64)"""
+        stop = min(stop, self.n)
+        if start >= stop:
+            return np.zeros(0, dtype=np.int64)
+        result = self._encrypt(np.arange(start, stop, dtype=np.uint64))
+        outside = np.flatnonzero(result >= self.n)
+        while outside.size:
+            result[outside] = self._encrypt(result[outside])
+            outside = outside[result[outside] >= self.n]
+        return result.astype(np.int64)
+
+    def __getitem__(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError("Номер вне перестановки")
+        return int(self.take(i, i + 1)[0])
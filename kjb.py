@@ -0,0 +1,105 @@
+import numpy as np
+from marker_codec import MarkerDecoder
+from keyed_permutation import KeyedPermutation
+
+
+def brightness(r, g, b):
+    return 0.299*r + 0.587*g + 0.114*b
+
+
+def select_indices(total_pixels: int, count: int, seed: int) -> np.ndarray:
+    """Первые count позиций ключевой перестановки пикселей (без перемешивания всего изображения)"""
+    return KeyedPermutation(total_pixels, seed).take(0, count)
+
+
+def embed_kjb_array(pixels: np.ndarray, bits, lam: float, seed: int, repeat: int = 1) -> np.ndarray:
+    """
+    Встраивание KJB на месте в массив RGB формы (h, w, 3).
+    Яркость считается сразу для всех выбранных пикселей, синий канал изменяется
+    на ±λY одним присваиванием по индексам. Каждый бит записывается в repeat
+    подряд идущих пикселей перестановки.
+    :return: линейные индексы использованных пикселей
+    """
+    h, w = pixels.shape[:2]
+    bits = np.repeat(np.asarray(bits, dtype=np.uint8), repeat)
+    used_indices = select_indices(h * w, len(bits), seed)
+    ys, xs = np.divmod(used_indices, w)
+
+    rgb = pixels[ys, xs].astype(np.float64)
+    Y = brightness(rgb[:, 0], rgb[:, 1], rgb[:, 2])
+    sign = np.where(bits == 1, 1.0, -1.0)
+    B_new = np.clip(rgb[:, 2] + sign * lam * Y, 0, 255)
+    pixels[ys, xs, 2] = B_new.astype(np.uint8)
+    return used_indices
+
+
+def cross_differences(blue: np.ndarray, indices: np.ndarray, sigma: int = 1) -> np.ndarray:
+    """
+    Отклонения B − B̂ синего канала от оценки по крестообразной окрестности только
+    в пикселях indices (линейные индексы): соседи на расстоянии до sigma по строке
+    и столбцу (без центра) собираются по индексам с учетом краев, поэтому память
+    и время пропорциональны числу индексов, а не размеру изображения.
+    """
+    h, w = blue.shape
+    ys, xs = np.divmod(indices, w)
+    sums = np.zeros(len(indices), dtype=np.int64)
+    counts = np.zeros(len(indices), dtype=np.int64)
+    for distance in range(1, sigma + 1):
+        for dy, dx in ((-distance, 0), (distance, 0), (0, -distance), (0, distance)):
+            ny, nx = ys + dy, xs + dx
+            inside = (ny >= 0) & (ny < h) & (nx >= 0) & (nx < w)
+            neighbours = blue[np.clip(ny, 0, h - 1), np.clip(nx, 0, w - 1)]
+            sums += np.where(inside, neighbours, 0)
+            counts += inside
+    # B − B̂ = (B·counts − sums) / counts; числитель целый, поэтому знак точный,
+    # а пиксель без соседей сравнивается сам с собой
+    return (blue[ys, xs] * counts - sums) / np.maximum(counts, 1)
+
+
+def iter_kjb_bits(pixels: np.ndarray, seed: int, sigma: int = 1,
+                  chunk_bits: int = 8192, repeat: int = 1):
+    """
+    Извлечение KJB из массива RGB формы (h, w, 3) порциями по chunk_bits бит в порядке
+    перестановки: бит равен 1, если среднее отклонение B − B̂ синего канала от оценки
+    по соседям по его repeat пикселям неотрицательно. Предсказание считается только
+    для пикселей текущей порции, поэтому генератор можно прервать, как только получено
+    достаточно бит, не обрабатывая остальное изображение.
+    """
+    h, w = pixels.shape[:2]
+    blue = pixels[..., 2]
+    total_bits = h * w // repeat
+    order = KeyedPermutation(h * w, seed)
+    for start in range(0, total_bits, chunk_bits):
+        stop = min(start + chunk_bits, total_bits)
+        chunk = order.take(start * repeat, stop * repeat)
+        differences = cross_differences(blue, chunk, sigma).reshape(-1, repeat)
+        yield (differences.mean(axis=1) >= 0).astype(np.uint8)
+
+
+def extract_kjb_array(pixels: np.ndarray, seed: int, sigma: int = 1, marker: bytes = None,
+                      chunk_bits: int = 8192, repeat: int = 1, length_bits: int = None) -> np.ndarray:
+    """
+    Извлечение KJB из массива RGB. Если задан length_bits, извлекается не больше
+    length_bits бит; если задан marker, извлечение останавливается на первом его вхождении.
+    Без них декодируется все изображение.
+    :return: массив бит uint8 (при найденном маркере — до конца маркера включительно)
+    """
+    if length_bits is not None:
+        chunk_bits = max(1, min(chunk_bits, length_bits))
+    chunks = iter_kjb_bits(pixels, seed, sigma, chunk_bits, repeat)
+    if marker is None:
+        collected, received = [], 0
+        for chunk in chunks:
+            if length_bits is not None:
+                chunk = chunk[:length_bits - received]
+            collected.append(chunk)
+            received += len(chunk)
+            if length_bits is not None and received >= length_bits:
+                break
+        return np.concatenate(collected) if collected else np.zeros(0, dtype=np.uint8)
+
+    decoder = MarkerDecoder(marker)
+    for chunk in chunks:
+        if decoder.feed(chunk):
+            break
+    return decoder.bits()
@@ -1,24 +1,64 @@
 import sys, os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFileDialog, QMessageBox, QRadioButton,
-    QGroupBox, QSplitter
+    QGroupBox, QSplitter, QComboBox, QProgressDialog
 )
-from PyQt6.QtGui import QPixmap, QImage, QColor
-from PyQt6.QtCore import Qt
-
-def create_bit_image(image, bit):
-    if image.isNull():
-        return QImage()
-    width, height = image.width(), image.height()
-    result = QImage(width, height, QImage.Format.Format_Grayscale8)
-    for y in range(height):
-        for x in range(width):
-            color = QColor(image.pixel(x, y))
-            gray_val = color.red()
-            extracted_bit = (gray_val >> bit) & 1
-            result.setPixel(x, y, 0xffffff if extracted_bit else 0)
-    return result
+from PyQt6.QtGui import QPixmap, QImage
+from PyQt6.QtCore import Qt, QEvent, QThread, pyqtSignal
+from PIL import Image
+from bit_planes import channel_names, plane_source, compute_plane, TiledPlaneRenderer
+from plane_export import read_pixels, plane_file_name, save_plane, build_jobs, export_image_planes, process_pool
+from qt_arrays import array_to_qimage
+
+VIEW_SIZE = 400
+ZOOM_STEPS = {"Вписать": None, "1:1": 1, "1:2": 2, "1:4": 4, "1:8": 8, "1:16": 16}
+MODES = {"Бит канала": "plane", "XOR со вторым": "xor", "Разность со вторым": "diff"}
+
+def load_pixels(path):
+    """Пиксели изображения всех каналов (см. plane_export.read_pixels) и текст ошибки (None, если ее нет)"""
+    try:
+        return read_pixels(path), None
+    except Image.DecompressionBombError:
+        return None, (f"изображение больше предела PIL ({2 * Image.MAX_IMAGE_PIXELS} пикселей); "
+                      f"сохраните его как несжатый BMP/PGM/PPM, такие файлы читаются через memmap")
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+def preview_image(pixels, size=VIEW_SIZE):
+    """Уменьшенная прореживанием копия для показа (без чтения всего изображения)"""
+    step = max(1, -(-max(pixels.shape[:2]) // size))
+    return array_to_qimage(pixels[::step, ::step])
+
+class PlaneExportThread(QThread):
+    """
+    Выполняет задания выгрузки плоскостей в пуле потоков или процессов, не блокируя GUI.
+    Отмена через requestInterruption: ожидающие задания снимаются, выполняемые дорабатывают.
+    """
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, pool, tasks):
+        super().__init__()
+        self.pool = pool
+        self.tasks = tasks
+        self.results = []
+        self.cancelled = False
+
+    def run(self):
+        with self.pool as pool:
+            futures = [pool.submit(function, *args) for function, args in self.tasks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    self.results.append(future.result())
+                except Exception as e:
+                    # Например, BrokenProcessPool при аварийном завершении процесса
+                    self.results.append({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+                self.progress.emit(done, len(futures))
+                if self.isInterruptionRequested():
+                    self.cancelled = True
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    break
 
 class BitImageVisualizer(QMainWindow):
     def __init__(self):
@@ -48,8 +88,15 @@ class BitImageVisualizer(QMainWindow):
         self.resize(1000, 500)
         self.selected_bit = 0
         self.image_path = None
-        self.original_image = QImage()
+        self.pixels = None
+        self.other_pixels = None
+        self.renderer = None
         self.processed_image = QImage()
+        self.view_x = 0
+        self.view_y = 0
+        self.drag_start = None
+        self.export_thread = None
+        self.export_dialog = None
         central_area = QWidget()
         self.setCentralWidget(central_area)
         main_layout = QHBoxLayout(central_area)
@@ -79,6 +126,23 @@ class BitImageVisualizer(QMainWindow):
             bits_layout.addWidget(rb)
         self.radio_buttons[0].setChecked(True)
         layout.addWidget(group_bits)
+        self.combo_channel = QComboBox()
+        layout.addWidget(QLabel("Канал:"))
+        layout.addWidget(self.combo_channel)
+        self.combo_mode = QComboBox()
+        self.combo_mode.addItems(MODES)
+        layout.addWidget(QLabel("Режим:"))
+        layout.addWidget(self.combo_mode)
+        self.btn_select_other = QPushButton("Второе изображение (для XOR/разности)")
+        self.btn_select_other.clicked.connect(self.select_other_image)
+        layout.addWidget(self.btn_select_other)
+        self.lbl_other = QLabel("Нет второго файла")
+        layout.addWidget(self.lbl_other)
+        self.combo_zoom = QComboBox()
+        self.combo_zoom.addItems(ZOOM_STEPS)
+        self.combo_zoom.currentIndexChanged.connect(self.on_zoom_changed)
+        layout.addWidget(QLabel("Масштаб (перетаскивание мышью — сдвиг):"))
+        layout.addWidget(self.combo_zoom)
         self.btn_show_bit = QPushButton("Показать выбранный бит")
         self.btn_show_bit.clicked.connect(self.show_bit)
         layout.addWidget(self.btn_show_bit)
@@ -88,6 +152,9 @@ class BitImageVisualizer(QMainWindow):
         self.btn_save_all = QPushButton("Сохранить все биты")
         self.btn_save_all.clicked.connect(self.save_all_bits)
         layout.addWidget(self.btn_save_all)
+        self.btn_save_folder = QPushButton("Сохранить биты папки")
+        self.btn_save_folder.clicked.connect(self.save_folder_bits)
+        layout.addWidget(self.btn_save_folder)
         layout.addStretch(1)
         parent.addWidget(panel)
 
@@ -98,14 +165,15 @@ class BitImageVisualizer(QMainWindow):
         layout_original = QVBoxLayout(group_original)
         self.lbl_original = QLabel("Нет картинки")
         self.lbl_original.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lbl_original.setFixedSize(400, 400)
+        self.lbl_original.setFixedSize(VIEW_SIZE, VIEW_SIZE)
         layout_original.addWidget(self.lbl_original)
         layout_view.addWidget(group_original)
         group_processed = QGroupBox("Результат")
         layout_processed = QVBoxLayout(group_processed)
         self.lbl_processed = QLabel("Нет картинки")
         self.lbl_processed.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lbl_processed.setFixedSize(400, 400)
+        self.lbl_processed.setFixedSize(VIEW_SIZE, VIEW_SIZE)
+        self.lbl_processed.installEventFilter(self)
         layout_processed.addWidget(self.lbl_processed)
         layout_view.addWidget(group_processed)
         parent.addWidget(view_widget)
@@ -116,40 +184,115 @@ class BitImageVisualizer(QMainWindow):
                 self.selected_bit = i
                 break
 
-    def select_image(self):
+    def ask_image_path(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Выберите картинку",
             "",
-            "Изображения (*.png *.jpg *.jpeg *.bmp *.pgm);;Все файлы (*)"
+            "Изображения (*.png *.jpg *.jpeg *.bmp *.pgm *.ppm);;Все файлы (*)"
         )
+        return file_path
+
+    def select_image(self):
+        file_path = self.ask_image_path()
         if file_path:
+            pixels, error = load_pixels(file_path)
+            if pixels is None:
+                QMessageBox.warning(self, "Ошибка", f"Не удалось открыть: {error}")
+                return
             self.image_path = file_path
             self.lbl_file.setText(file_path)
-            if not self.original_image.load(file_path):
-                QMessageBox.warning(self, "Ошибка", "Не удалось открыть!")
-                return
-            if self.original_image.format() != QImage.Format.Format_Grayscale8:
-                self.original_image = self.original_image.convertToFormat(QImage.Format.Format_Grayscale8)
-            pixmap = QPixmap.fromImage(self.original_image).scaled(
+            self.pixels = pixels
+            self.renderer = TiledPlaneRenderer(pixels)
+            if self.other_pixels is not None and self.other_pixels.shape != pixels.shape:
+                self.other_pixels = None
+                self.lbl_other.setText("Нет второго файла")
+            self.renderer.set_other(self.other_pixels)
+            self.combo_channel.clear()
+            self.combo_channel.addItems(channel_names(pixels))
+            self.view_x = self.view_y = 0
+            pixmap = QPixmap.fromImage(preview_image(pixels)).scaled(
                 self.lbl_original.size(),
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation
             )
             self.lbl_original.setPixmap(pixmap)
 
+    def select_other_image(self):
+        if self.renderer is None:
+            QMessageBox.warning(self, "Ошибка", "Сначала выберите картинку!")
+            return
+        file_path = self.ask_image_path()
+        if file_path:
+            pixels, error = load_pixels(file_path)
+            if pixels is None:
+                QMessageBox.warning(self, "Ошибка", f"Не удалось открыть: {error}")
+                return
+            try:
+                self.renderer.set_other(pixels)
+            except ValueError as e:
+                QMessageBox.warning(self, "Ошибка", str(e))
+                return
+            self.other_pixels = pixels
+            self.lbl_other.setText(file_path)
+
+    def current_mode(self):
+        return MODES[self.combo_mode.currentText()]
+
+    def current_step(self):
+        step = ZOOM_STEPS[self.combo_zoom.currentText()]
+        if step is None:
+            step = max(1, -(-max(self.pixels.shape[:2]) // VIEW_SIZE))
+        return step
+
+    def on_zoom_changed(self):
+        if not self.processed_image.isNull():
+            self.show_bit()
+
     def show_bit(self):
-        if self.original_image.isNull():
+        if self.renderer is None:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите картинку!")
             return
-        self.processed_image = create_bit_image(self.original_image, self.selected_bit)
-        pixmap = QPixmap.fromImage(self.processed_image).scaled(
-            self.lbl_processed.size(),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        )
+        mode = self.current_mode()
+        if mode != "plane" and self.other_pixels is None:
+            QMessageBox.warning(self, "Ошибка", "Для этого режима выберите второе изображение!")
+            return
+        step = self.current_step()
+        h, w = self.pixels.shape[:2]
+        self.view_x = min(max(self.view_x, 0), max(0, w - VIEW_SIZE * step))
+        self.view_y = min(max(self.view_y, 0), max(0, h - VIEW_SIZE * step))
+        view = self.renderer.render(self.combo_channel.currentIndex(), self.selected_bit, mode,
+                                    self.view_x, self.view_y, VIEW_SIZE, VIEW_SIZE, step)
+        self.processed_image = array_to_qimage(view)
+        pixmap = QPixmap.fromImage(self.processed_image)
+        if ZOOM_STEPS[self.combo_zoom.currentText()] is None:
+            pixmap = pixmap.scaled(
+                self.lbl_processed.size(),
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.FastTransformation
+            )
         self.lbl_processed.setPixmap(pixmap)
 
+    def eventFilter(self, obj, event):
+        if obj is self.lbl_processed and not self.processed_image.isNull():
+            if event.type() == QEvent.Type.MouseButtonPress:
+                self.drag_start = event.position().toPoint()
+            elif event.type() == QEvent.Type.MouseMove and self.drag_start is not None:
+                position = event.position().toPoint()
+                step = self.current_step()
+                self.view_x -= (position.x() - self.drag_start.x()) * step
+                self.view_y -= (position.y() - self.drag_start.y()) * step
+                self.drag_start = position
+                self.show_bit()
+            elif event.type() == QEvent.Type.MouseButtonRelease:
+                self.drag_start = None
+        return super().eventFilter(obj, event)
+
+    def plane_file_name(self, bit):
+        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
+        channel_name = self.combo_channel.currentText() if self.pixels.ndim == 3 else None
+        return plane_file_name(base_name, bit, channel_name, self.current_mode())
+
     def save_one_bit(self):
         if self.processed_image.isNull():
             QMessageBox.warning(self, "Ошибка", "Нет результата!")
@@ -157,38 +300,75 @@ class BitImageVisualizer(QMainWindow):
         folder = QFileDialog.getExistingDirectory(self, "Выберите папку")
         if not folder:
             return
-        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-        save_name = f"{base_name}_bit_{self.selected_bit}.bmp"
-        save_path = os.path.join(folder, save_name)
+        # Сохраняется плоскость в полном разрешении, а не видимая область
+        plane = compute_plane(self.pixels, self.combo_channel.currentIndex(), self.selected_bit,
+                              self.current_mode(), self.other_pixels)
+        save_path = os.path.join(folder, self.plane_file_name(self.selected_bit))
         save_path = save_path.replace("\\", "/")
-        if self.processed_image.save(save_path, "BMP"):
+        if array_to_qimage(plane).save(save_path, "BMP"):
             QMessageBox.information(self, "Успех", f"Один бит сохранен: {save_path}")
         else:
             QMessageBox.warning(self, "Ошибка", "Не вышло сохранить!")
 
     def save_all_bits(self):
-        if self.original_image.isNull():
+        if self.pixels is None:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите картинку!")
             return
+        mode = self.current_mode()
+        if mode == "diff" or (mode == "xor" and self.other_pixels is None):
+            QMessageBox.warning(self, "Ошибка", "Все биты сохраняются в режимах бита канала и XOR (со вторым изображением)")
+            return
         folder = QFileDialog.getExistingDirectory(self, "Выберите папку")
         if not folder:
             return
-        success = True
-        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-        save_path = ""  
+        # Восемь плоскостей считаются и записываются параллельно в пуле потоков:
+        # NumPy и кодирование BMP отпускают GIL, а массив пикселей не копируется
+        values = plane_source(self.pixels, self.combo_channel.currentIndex(), mode, self.other_pixels)
+        tasks = []
         for b in range(8):
-            bit_image = create_bit_image(self.original_image, b)
-            save_name = f"{base_name}_bit_{b}.bmp"
-            path_tmp = os.path.join(folder, save_name)
+            path_tmp = os.path.join(folder, self.plane_file_name(b))
             path_tmp = path_tmp.replace("\\", "/")
-            if not bit_image.save(path_tmp, "BMP"):
-                success = False
-            save_path = path_tmp
-        QMessageBox.information(
-            self,
-            "Успех",
-            f"Все биты сохранены: {save_path}" if success else "Ошибка при сохранении одного или нескольких файлов"
-        )
+            tasks.append((save_plane, (values, b, path_tmp)))
+        self.start_export(ThreadPoolExecutor(max_workers=8), tasks, "Сохранение битов...")
+
+    def save_folder_bits(self):
+        input_folder = QFileDialog.getExistingDirectory(self, "Папка с изображениями")
+        if not input_folder:
+            return
+        output_folder = QFileDialog.getExistingDirectory(self, "Папка для битов")
+        if not output_folder:
+            return
+        jobs = build_jobs(input_folder, output_folder)
+        if not jobs:
+            QMessageBox.warning(self, "Ошибка", "В папке нет изображений!")
+            return
+        tasks = [(export_image_planes, (job,)) for job in jobs]
+        self.start_export(process_pool(), tasks, "Сохранение битов папки...")
+
+    def start_export(self, pool, tasks, title):
+        if self.export_thread is not None:
+            pool.shutdown()
+            QMessageBox.warning(self, "Ошибка", "Выгрузка уже выполняется!")
+            return
+        self.export_dialog = QProgressDialog(title, "Отмена", 0, len(tasks), self)
+        self.export_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_dialog.setMinimumDuration(0)
+        self.export_thread = PlaneExportThread(pool, tasks)
+        self.export_thread.progress.connect(lambda done, total: self.export_dialog.setValue(done))
+        self.export_dialog.canceled.connect(self.export_thread.requestInterruption)
+        self.export_thread.finished.connect(self.on_export_finished)
+        self.export_thread.start()
+
+    def on_export_finished(self):
+        thread, self.export_thread = self.export_thread, None
+        self.export_dialog.close()
+        failed = [result for result in thread.results if result['status'] != 'ok']
+        if thread.cancelled:
+            QMessageBox.information(self, "Отменено", f"Выгрузка отменена, выполнено заданий: {len(thread.results)}")
+        elif failed:
+            QMessageBox.warning(self, "Ошибка", f"Ошибка при сохранении: {failed[0]['error']} (всего ошибок: {len(failed)})")
+        else:
+            QMessageBox.information(self, "Успех", f"Все биты сохранены, заданий: {len(thread.results)}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,145 +1,52 @@
 import sys, os
 import numpy as np
 import difflib
-from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox, QTabWidget, QPlainTextEdit, QDoubleSpinBox, QLineEdit, QGroupBox
+from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox, QTabWidget, QPlainTextEdit, QDoubleSpinBox, QSpinBox, QLineEdit, QGroupBox
 from PyQt6.QtGui import QPixmap, QImage, QColor
 from PyQt6.QtCore import Qt
+from marker_codec import END_MARKER, text_to_bits_with_marker, bits_to_text_with_marker
+from kjb import embed_kjb_array, extract_kjb_array
+from qt_arrays import qimage_view
+from metrics import distortion_metrics
 
-END_MARKER = b"\xfe\x00\xff\xfa"
-
-def text_to_bits_with_marker(text: str) -> list[int]:
-    data = text.encode('utf-8', errors='replace')
-    data_marker = data + END_MARKER
-    bits = []
-    for byte in data_marker:
-        for i in range(8):
-            bit = (byte >> (7 - i)) & 1
-            bits.append(bit)
-    return bits
-
-def bits_to_text_with_marker(bits: list[int]) -> str:
-    if not bits:
-        return ""
-    r = len(bits) % 8
-    if r != 0:
-        bits += [0]*(8-r)
-    raw_bytes = bytearray()
-    for i in range(0, len(bits), 8):
-        val = 0
-        for b in bits[i:i+8]:
-            val = (val << 1) | b
-        raw_bytes.append(val)
-    idx_marker = raw_bytes.find(END_MARKER)
-    if idx_marker < 0:
-        payload = raw_bytes
-    else:
-        payload = raw_bytes[:idx_marker]
-    text = payload.decode('utf-8', errors='replace')
-    return text
-
-def brightness(r, g, b):
-    return 0.299*r + 0.587*g + 0.114*b
-
-def embed_kjb(cover: QImage, bits: list[int], lam: float, seed: int):
+def embed_kjb(cover: QImage, bits: list[int], lam: float, seed: int, repeat: int = 1):
     if cover.isNull():
         return QImage(), []
     w, h = cover.width(), cover.height()
     total_pixels = w * h
-    if len(bits) > total_pixels:
+    if len(bits) * repeat > total_pixels:
         return QImage(), []
     cover = cover.convertToFormat(QImage.Format.Format_RGB888)
-    result = QImage(cover)
-    rng = np.random.default_rng(seed)
-    all_indices = np.arange(total_pixels)
-    rng.shuffle(all_indices)
-    used_indices = all_indices[:len(bits)]
-    for i, bit_val in enumerate(bits):
-        lin = used_indices[i]
-        y = lin // w
-        x = lin % w
-        c = result.pixelColor(x, y)
-        R, G, B_ = c.red(), c.green(), c.blue()
-        Y = brightness(R, G, B_)
-        if bit_val == 1:
-            B_new = B_ + lam * Y
-        else:
-            B_new = B_ - lam * Y
-        if B_new < 0:
-            B_new = 0
-        elif B_new > 255:
-            B_new = 255
-        c.setBlue(int(B_new))
-        result.setPixelColor(x, y, c)
+    result = cover.copy()
+    used_indices = embed_kjb_array(qimage_view(result, 3, writable=True), bits, lam, seed, repeat)
     return result, used_indices
 
-def extract_kjb(img: QImage, lam: float, seed: int) -> list[int]:
+def extract_kjb(img: QImage, lam: float, seed: int, sigma: int = 1, repeat: int = 1) -> list[int]:
     if img.isNull():
         return []
-    w, h = img.width(), img.height()
-    total_pixels = w * h
     img = img.convertToFormat(QImage.Format.Format_RGB888)
-    rng = np.random.default_rng(seed)
-    all_indices = np.arange(total_pixels)
-    rng.shuffle(all_indices)
-    bits = []
-    for i in range(total_pixels):
-        lin = all_indices[i]
-        y = lin // w
-        x = lin % w
-        c = img.pixelColor(x, y)
-        B_val = c.blue()
-        neighbors = []
-        if x > 0:
-            neighbors.append(img.pixelColor(x - 1, y).blue())
-        if x < w - 1:
-            neighbors.append(img.pixelColor(x + 1, y).blue())
-        if y > 0:
-            neighbors.append(img.pixelColor(x, y - 1).blue())
-        if y < h - 1:
-            neighbors.append(img.pixelColor(x, y + 1).blue())
-        if neighbors:
-            b_est = sum(neighbors) / len(neighbors)
-        else:
-            b_est = B_val
-        bit = 1 if B_val >= b_est else 0
-        bits.append(bit)
-    return bits
+    bits = extract_kjb_array(qimage_view(img, 3), seed, sigma, marker=END_MARKER, repeat=repeat)
+    return bits.tolist()
 
-def measure_blue_diff(original: QImage, watermarked: QImage) -> float:
+def blue_metrics(original: QImage, watermarked: QImage, used_indices: np.ndarray = None):
+    """Метрики синего канала (см. metrics.distortion_metrics) или None, если сравнивать нечего"""
     if original.isNull() or watermarked.isNull():
-        return 0.0
-    w1, h1 = original.width(), original.height()
-    w2, h2 = watermarked.width(), watermarked.height()
-    if (w1 != w2) or (h1 != h2):
-        return 0.0
+        return None
+    if original.size() != watermarked.size():
+        return None
     orig = original.convertToFormat(QImage.Format.Format_RGB888)
     wtm = watermarked.convertToFormat(QImage.Format.Format_RGB888)
-    total_pixels = w1 * h1
-    diff_sum = 0
-    for y in range(h1):
-        for x in range(w1):
-            b1 = orig.pixelColor(x, y).blue()
-            b2 = wtm.pixelColor(x, y).blue()
-            diff_sum += abs(b1 - b2)
-    return diff_sum / total_pixels
+    return distortion_metrics(qimage_view(orig, 3)[..., 2], qimage_view(wtm, 3)[..., 2], used_indices)
+
+def measure_blue_diff(original: QImage, watermarked: QImage) -> float:
+    metrics = blue_metrics(original, watermarked)
+    return float(metrics['mad'][0]) if metrics else 0.0
 
 def measure_changed_only(original: QImage, watermarked: QImage, used_indices: np.ndarray) -> float:
-    if original.isNull() or watermarked.isNull() or used_indices.size == 0:
+    if used_indices.size == 0:
         return 0.0
-    w1, h1 = original.width(), original.height()
-    w2, h2 = watermarked.width(), watermarked.height()
-    if (w1 != w2) or (h1 != h2):
-        return 0.0
-    orig = original.convertToFormat(QImage.Format.Format_RGB888)
-    wtm = watermarked.convertToFormat(QImage.Format.Format_RGB888)
-    diff_sum = 0
-    for lin in used_indices:
-        y = lin // w1
-        x = lin % w1
-        b1 = orig.pixelColor(x, y).blue()
-        b2 = wtm.pixelColor(x, y).blue()
-        diff_sum += abs(b1 - b2)
-    return diff_sum / used_indices.size
+    metrics = blue_metrics(original, watermarked, used_indices)
+    return float(metrics['mad'][0]) if metrics else 0.0
 
 class KJBApp(QMainWindow):
     def __init__(self):
@@ -209,6 +116,13 @@ class KJBApp(QMainWindow):
         self.seed_line = QLineEdit("12345")
         s_lay.addWidget(self.seed_line)
         pv.addWidget(group_seed)
+        group_repeat = QGroupBox("r (повторений каждого бита)")
+        r_lay = QHBoxLayout(group_repeat)
+        self.spin_repeat = QSpinBox()
+        self.spin_repeat.setRange(1, 64)
+        self.spin_repeat.setValue(1)
+        r_lay.addWidget(self.spin_repeat)
+        pv.addWidget(group_repeat)
         self.btn_embed = QPushButton("Встроить")
         self.btn_embed.clicked.connect(self.do_embed)
         pv.addWidget(self.btn_embed)
@@ -259,7 +173,7 @@ class KJBApp(QMainWindow):
         except ValueError:
             seed_val = 12345
         bits = text_to_bits_with_marker(text_in)
-        res_img, used_idx = embed_kjb(self.cover_image, bits, lam, seed_val)
+        res_img, used_idx = embed_kjb(self.cover_image, bits, lam, seed_val, self.spin_repeat.value())
         if res_img.isNull():
             QMessageBox.warning(self, "Ошибка", "Недостаточно пикселей!")
             return
@@ -310,6 +224,20 @@ class KJBApp(QMainWindow):
         self.seed_line_ext = QLineEdit("12345")
         s2_lay.addWidget(self.seed_line_ext)
         pv.addWidget(group_seed2)
+        group_sigma = QGroupBox("σ (размер креста предсказателя)")
+        sigma_lay = QHBoxLayout(group_sigma)
+        self.spin_sigma = QSpinBox()
+        self.spin_sigma.setRange(1, 8)
+        self.spin_sigma.setValue(1)
+        sigma_lay.addWidget(self.spin_sigma)
+        pv.addWidget(group_sigma)
+        group_repeat2 = QGroupBox("r (то же)")
+        r2_lay = QHBoxLayout(group_repeat2)
+        self.spin_repeat_ext = QSpinBox()
+        self.spin_repeat_ext.setRange(1, 64)
+        self.spin_repeat_ext.setValue(1)
+        r2_lay.addWidget(self.spin_repeat_ext)
+        pv.addWidget(group_repeat2)
         self.btn_extract = QPushButton("Извлечь")
         self.btn_extract.clicked.connect(self.do_extract)
         pv.addWidget(self.btn_extract)
@@ -350,7 +278,7 @@ class KJBApp(QMainWindow):
             seed_val = int(self.seed_line_ext.text())
         except ValueError:
             seed_val = 12345
-        raw_bits = extract_kjb(self.watermarked_image, 0, seed_val)
+        raw_bits = extract_kjb(self.watermarked_image, 0, seed_val, self.spin_sigma.value(), self.spin_repeat_ext.value())
         text_out = bits_to_text_with_marker(raw_bits)
         self.txt_output.setPlainText(text_out)
         QMessageBox.information(self, "OK", "Сообщение извлечено.")
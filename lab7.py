@@ -122,6 +122,12 @@ class SteganographyApp(QMainWindow):
         params_layout.addWidget(self.seed_spinbox)
         params_layout.addWidget(QLabel("Метод:"))
         params_layout.addWidget(self.method_combo)
+        
+        self.bits_spinbox = QSpinBox()
+        self.bits_spinbox.setRange(1, Steganographer.MAX_BITS_PER_SAMPLE)
+        self.bits_spinbox.setValue(1)
+        params_layout.addWidget(QLabel("Бит на отсчёт (k):"))
+        params_layout.addWidget(self.bits_spinbox)
         params_group.setLayout(params_layout)
         
         # Кнопка встраивания
@@ -171,6 +177,12 @@ class SteganographyApp(QMainWindow):
         extract_params_layout.addWidget(self.extract_seed_spinbox)
         extract_params_layout.addWidget(QLabel("Метод:"))
         extract_params_layout.addWidget(self.extract_method_combo)
+        
+        self.extract_bits_spinbox = QSpinBox()
+        self.extract_bits_spinbox.setRange(1, Steganographer.MAX_BITS_PER_SAMPLE)
+        self.extract_bits_spinbox.setValue(1)
+        extract_params_layout.addWidget(QLabel("Бит на отсчёт (k):"))
+        extract_params_layout.addWidget(self.extract_bits_spinbox)
         extract_params_group.setLayout(extract_params_layout)
         
         # Кнопка извлечения
@@ -277,44 +289,39 @@ class SteganographyApp(QMainWindow):
         method = self.method_combo.currentText()
 
         
-        temp_path = None
         try:
-            # Создаём временный файл
-            temp_path = f"temp_image_{os.getpid()}.png"
-            self.original_image.save(temp_path)
-            
-            stego = Steganographer(temp_path)
+            stego = Steganographer(self.original_image)
 
-            text_bytes = message.encode('utf-8')
-            basic_bits = len(text_bytes) * 8
-            enhanced_bits = basic_bits + (basic_bits // 64) * 16  # +16 бит хэша на каждый 64-битный блок
+            k = self.bits_spinbox.value()
+            plan = stego.plan_capacity(message, "basic" if method == "Базовый метод" else "enhanced")
+            plan_lines = "\n".join(
+                f"• k = {bits}: {p['samples']} отсчётов, ожидаемый PSNR {p['psnr']:.2f} dB"
+                f"{'' if p['fits'] else ' (не помещается)'}"
+                for bits, p in plan['plans'].items()
+            )
+            min_k = plan['min_k'] if plan['min_k'] is not None else "—"
 
-            # Выводим сравнение в интерфейс (добавьте QLabel в GUI)
+            # Выводим сравнение в интерфейс
             self.capacity_label.setText(
                 f"Ёмкость:\n"
-                f"• Базовый метод: {basic_bits} бит ({basic_bits//8} символов)\n"
-                f"• С хэшем: {enhanced_bits} бит ({enhanced_bits//8} символов)\n"
-                f"• Максимум в изображении: {stego.pixels.size} бит"
+                f"• Требуется: {plan['required_bits']} бит\n"
+                f"• Доступно отсчётов в изображении: {plan['available_samples']}\n"
+                f"{plan_lines}\n"
+                f"• Минимальное k: {min_k}"
             )
             
-            
-            # Вычисление размера сообщения (теперь message точно определена)
-            required_bits = len(message.encode('utf-8')) * 8
+            if not plan['plans'][k]['fits']:
+                QMessageBox.warning(
+                    self, 
+                    "Ошибка", 
+                    f"Сообщение слишком длинное для k = {k}. Минимальное подходящее k: {min_k}"
+                )
+                return
             
             if method == "Базовый метод":
-                max_bits = stego.pixels.size
-                
-                if required_bits > max_bits:
-                    QMessageBox.warning(
-                        self, 
-                        "Ошибка", 
-                        f"Сообщение слишком длинное. Максимум: {max_bits//8} символов"
-                    )
-                    return
-                    
-                result_image = stego.embed_basic(message, seed)
+                result_image = stego.embed_basic(message, seed, k)
             else:
-                result_image = stego.embed_enhanced(message, seed)
+                result_image = stego.embed_enhanced(message, seed, k)
             
             # Сохраняем результат
             save_path, _ = QFileDialog.getSaveFileName(
@@ -333,14 +340,6 @@ class SteganographyApp(QMainWindow):
         
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Произошла ошибка: {str(e)}")
-        
-        finally:
-            # Гарантированно удаляем временный файл
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except Exception as e:
-                    print(f"Ошибка при удалении временного файла: {str(e)}")
     
     def extract_message(self):
         if not self.stego_image:
@@ -349,6 +348,7 @@ class SteganographyApp(QMainWindow):
         
         seed = self.extract_seed_spinbox.value()
         method = self.extract_method_combo.currentText()
+        k = self.extract_bits_spinbox.value()
         
         try:
             stego = Steganographer.from_image(self.stego_image)
@@ -358,17 +358,18 @@ class SteganographyApp(QMainWindow):
                     self, 
                     "Длина сообщения", 
                     "Введите длину сообщения в битах:", 
-                    100, 1, stego.pixels.size, 1
+                    100, 1, stego.sample_count * k, 1
                 )
                 if not ok:
                     return
                 
-                extracted_text = stego.extract_basic(seed, length)
+                extracted_text = stego.extract_basic(seed, length, k)
             else:
-                extracted_text, error = stego.extract_enhanced(seed)
-                if error:
+                extracted_text, block_ok = stego.extract_enhanced(seed, k)
+                if not block_ok.all():
                     QMessageBox.warning(self, "Предупреждение", 
-                                    "При извлечении обнаружены ошибки в данных!")
+                                    f"При извлечении обнаружены ошибки в данных! "
+                                    f"Повреждено блоков: {np.count_nonzero(~block_ok)} из {block_ok.size}")
             
             self.extracted_message.setPlainText(extracted_text)
         
@@ -381,23 +382,21 @@ class SteganographyApp(QMainWindow):
             return
 
         try:
-            # Создаем временный файл
-            temp_path = f"temp_analysis_{os.getpid()}.png"
-            self.stego_image.save(temp_path)
-            
             # Анализируем
-            stego = Steganographer(temp_path)
+            stego = Steganographer(self.stego_image)
             
             # Получаем результаты
             lsb_dist = stego.analyze_lsb_distribution()
             chi2_result = stego.chi_square_test()
+            chi2_curve = stego.chi_square_curve()
             
             # Формируем отчет
             report = (
                 f"=== Анализ LSB ===\n"
                 f"Среднее значение LSB: {np.mean(lsb_dist):.4f}\n"
                 f"Дисперсия LSB: {np.var(lsb_dist):.4f}\n"
-                f"χ² тест (p-value): {chi2_result:.4f}\n\n"
+                f"χ² тест (p-value): {chi2_result:.4f}\n"
+                f"Оценка доли изображения со встраиванием: {chi2_curve['extent'] * 100:.0f}%\n\n"
             )
             
             # Интерпретация результатов
@@ -410,9 +409,6 @@ class SteganographyApp(QMainWindow):
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка анализа: {str(e)}")
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
         
         # import matplotlib.pyplot as plt
         #     plt.imshow(lsb_dist, cmap='hot', interpolation='nearest')
@@ -431,16 +427,10 @@ class SteganographyApp(QMainWindow):
             return
 
         try:
-            # Создаем временные файлы для сравнения
-            original_path = f"temp_original_{os.getpid()}.png"
-            stego_path = f"temp_stego_{os.getpid()}.png"
-            
-            self.original_for_compare.save(original_path)
-            self.stego_image.save(stego_path)
-            
             # Сравниваем изображения
-            stego = Steganographer(stego_path)
-            metrics = stego.compare_containers(original_path, stego_path)
+            original = Steganographer(self.original_for_compare)
+            stego = Steganographer(self.stego_image)
+            metrics = stego.compare_containers(original, stego)
             
             # Формируем отчет
             report = (
@@ -449,24 +439,27 @@ class SteganographyApp(QMainWindow):
                 f"PSNR: {metrics['psnr']:.2f} dB\n"
                 f"Измененные пиксели: {metrics['changed_pixels']}\n"
                 f"Измененные LSB: {metrics['lsb_changes']}\n"
+                f"SSIM: {metrics['ssim']:.5f}\n"
             )
+            channels = metrics['channels']
+            for c in range(len(channels['psnr'])):
+                report += (
+                    f"Канал {c}: PSNR {channels['psnr'][c]:.2f} dB, SSIM {channels['ssim'][c]:.5f}, "
+                    f"JS гистограмм {channels['histogram_js'][c]:.2e}, JS LSB {channels['lsb_js'][c]:.2e}, "
+                    f"доля измененных LSB {channels['lsb_change_rate'][c]:.4f}\n"
+                )
             
             self.compare_result.setPlainText(report)
             
             # Показываем визуализацию
-            diff_image = stego.visualize_changes(original_path, stego_path)
+            diff_image = stego.visualize_changes(original, stego)
             diff_image.show()
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка сравнения", f"Ошибка: {str(e)}")
-        finally:
-            # Удаляем временные файлы
-            for path in [original_path, stego_path]:
-                if 'path' in locals() and os.path.exists(path):
-                    os.remove(path)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = SteganographyApp()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
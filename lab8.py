@@ -2,9 +2,10 @@ import sys
 import os
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, QTextEdit, 
-                            QFileDialog, QMessageBox)
+                            QFileDialog, QMessageBox, QComboBox, QCheckBox)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
+import whitespace_stego
 
 class SteganographyApp(QMainWindow):
     def __init__(self):
@@ -54,6 +55,30 @@ class SteganographyApp(QMainWindow):
         
         main_layout.addLayout(mid_layout)
         
+        # Параметры кодирования: алфавит промежутков и использование концов строк
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel("Кодирование промежутков:"))
+        self.alphabet_combo = QComboBox()
+        for alphabet, title in (('spaces', "1 бит: 1-2 пробела"),
+                                ('spaces4', "2 бита: 1-4 пробела"),
+                                ('tabs', "3 бита: пробелы и табуляции"),
+                                ('zero_width', "4 бита: невидимые символы")):
+            self.alphabet_combo.addItem(title, alphabet)
+        self.alphabet_combo.setCurrentIndex(1)
+        self.alphabet_combo.currentIndexChanged.connect(self.update_capacity)
+        options_layout.addWidget(self.alphabet_combo)
+        
+        self.trailing_check = QCheckBox("Использовать концы строк")
+        self.trailing_check.toggled.connect(self.update_capacity)
+        options_layout.addWidget(self.trailing_check)
+        
+        self.capacity_label = QLabel()
+        options_layout.addWidget(self.capacity_label)
+        options_layout.addStretch()
+        main_layout.addLayout(options_layout)
+        self.source_text.textChanged.connect(self.update_capacity)
+        self.update_capacity()
+        
         # Нижняя панель - кнопки для встраивания и извлечения
         bottom_layout = QHBoxLayout()
         
@@ -63,8 +88,16 @@ class SteganographyApp(QMainWindow):
         self.extract_btn = QPushButton("Извлечь сообщение")
         self.extract_btn.clicked.connect(self.extract_message)
         
+        self.embed_file_btn = QPushButton("Встроить в файл")
+        self.embed_file_btn.clicked.connect(self.embed_to_file)
+        
+        self.extract_file_btn = QPushButton("Извлечь из файла")
+        self.extract_file_btn.clicked.connect(self.extract_from_file)
+        
         bottom_layout.addWidget(self.embed_btn)
         bottom_layout.addWidget(self.extract_btn)
+        bottom_layout.addWidget(self.embed_file_btn)
+        bottom_layout.addWidget(self.extract_file_btn)
         
         main_layout.addLayout(bottom_layout)
         
@@ -74,6 +107,16 @@ class SteganographyApp(QMainWindow):
         self.result_text.setReadOnly(True)
         main_layout.addWidget(self.result_text)
     
+    def alphabet(self):
+        return self.alphabet_combo.currentData()
+    
+    def update_capacity(self):
+        """Емкость исходного текста при выбранном кодировании (без 4 байт заголовка длины)"""
+        lines = self.source_text.toPlainText().splitlines()
+        bits = whitespace_stego.capacity_bits(lines, self.alphabet(), self.trailing_check.isChecked())
+        capacity = max(0, bits - whitespace_stego.HEADER_BITS) // 8
+        self.capacity_label.setText(f"Емкость: {capacity} байт UTF-8")
+    
     def load_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Открыть текстовый файл", "", "Text Files (*.txt);;All Files (*)")
         
@@ -104,33 +147,17 @@ class SteganographyApp(QMainWindow):
             QMessageBox.warning(self, "Предупреждение", "Необходимо заполнить оба текстовых поля")
             return
         
-        # Конвертируем сообщение в двоичный код
-        binary_message = ''.join(format(ord(char), '08b') for char in secret_msg)
-        
-        # Добавляем маркер конца сообщения (8 бит '1')
-        binary_message += '11111111'
-        
-        # Разбиваем текст на слова
-        words = cover_text.split()
-        
-        if len(binary_message) > len(words) - 1:
-            QMessageBox.critical(self, "Ошибка", "Текст слишком короткий для встраивания сообщения")
-            return
-        
         # Встраиваем сообщение, изменяя количество пробелов между словами
-        stego_text = words[0]
-        for i in range(len(binary_message)):
-            if binary_message[i] == '0':
-                stego_text += ' ' + words[i + 1]  # Один пробел для бита '0'
-            else:
-                stego_text += '  ' + words[i + 1]  # Два пробела для бита '1'
-        
-        # Добавляем оставшиеся слова, если они есть
-        if len(binary_message) < len(words) - 1:
-            stego_text += ' ' + ' '.join(words[len(binary_message) + 1:])
+        try:
+            stego_text = whitespace_stego.embed_text(cover_text, secret_msg, self.alphabet(),
+                                                     self.trailing_check.isChecked())
+        except ValueError as e:
+            QMessageBox.critical(self, "Ошибка", str(e))
+            return
         
         self.result_text.setText(stego_text)
         QMessageBox.information(self, "Успех", "Сообщение успешно встроено в текст")
+    
     def extract_message(self):
         stego_text = self.source_text.toPlainText()
         
@@ -139,44 +166,57 @@ class SteganographyApp(QMainWindow):
             return
         
         # Извлекаем биты из пробелов между словами
-        binary_message = ''
-        i = 0
-        while i < len(stego_text):
-            if stego_text[i] == ' ':
-                # Проверяем, сколько пробелов подряд
-                space_count = 0
-                while i < len(stego_text) and stego_text[i] == ' ':
-                    space_count += 1
-                    i += 1
-                
-                if space_count == 1:
-                    binary_message += '0'
-                elif space_count == 2:
-                    binary_message += '1'
-            else:
-                i += 1
-        
-        # Ищем маркер конца сообщения (8 бит '1')
-        end_marker = '11111111'
-        end_marker_index = binary_message.find(end_marker)
-        
-        if end_marker_index == -1:
-            QMessageBox.warning(self, "Предупреждение", "Маркер конца сообщения не найден")
+        try:
+            extracted_message = whitespace_stego.extract_text(stego_text, self.alphabet())
+        except ValueError as e:
+            QMessageBox.critical(self, "Ошибка", f"{str(e)}: проверьте выбранное кодирование")
+            return
+        if extracted_message is None:
+            QMessageBox.warning(self, "Предупреждение", "Текст закончился раньше, чем сообщение")
             return
-        
-        # Извлекаем только полезную часть сообщения (до маркера)
-        binary_message = binary_message[:end_marker_index]
-        
-        # Преобразуем биты обратно в текст
-        extracted_message = ''
-        for i in range(0, len(binary_message), 8):
-            if i + 8 <= len(binary_message):
-                byte = binary_message[i:i+8]
-                extracted_message += chr(int(byte, 2))
         
         self.secret_message.clear()
         self.result_text.setText(extracted_message)
         QMessageBox.information(self, "Успех", "Сообщение успешно извлечено")
+    
+    def embed_to_file(self):
+        """Встраивание в большой текстовый файл потоком строк, без загрузки в окно"""
+        secret_msg = self.secret_message.toPlainText()
+        if not secret_msg:
+            QMessageBox.warning(self, "Предупреждение", "Необходимо ввести секретное сообщение")
+            return
+        cover_path, _ = QFileDialog.getOpenFileName(self, "Текст-контейнер", "", "Text Files (*.txt);;All Files (*)")
+        if not cover_path:
+            return
+        output_path, _ = QFileDialog.getSaveFileName(self, "Сохранить стегонограмму", "", "Text Files (*.txt);;All Files (*)")
+        if not output_path:
+            return
+        try:
+            whitespace_stego.embed_file(cover_path, output_path, secret_msg, self.alphabet(),
+                                        self.trailing_check.isChecked())
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось встроить сообщение: {str(e)}")
+            return
+        QMessageBox.information(self, "Успех", f"Стегонограмма сохранена: {output_path}")
+    
+    def extract_from_file(self):
+        """Извлечение из текстового файла потоком строк"""
+        stego_path, _ = QFileDialog.getOpenFileName(self, "Стегонограмма", "", "Text Files (*.txt);;All Files (*)")
+        if not stego_path:
+            return
+        try:
+            extracted_message = whitespace_stego.extract_file(stego_path, self.alphabet())
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть файл: {str(e)}")
+            return
+        except ValueError as e:
+            QMessageBox.critical(self, "Ошибка", f"{str(e)}: проверьте выбранное кодирование")
+            return
+        if extracted_message is None:
+            QMessageBox.warning(self, "Предупреждение", "Текст закончился раньше, чем сообщение")
+            return
+        self.result_text.setText(extracted_message)
+        QMessageBox.information(self, "Успех", "Сообщение успешно извлечено")
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,134 @@
+import numpy as np
+from marker_codec import MarkerDecoder
+from keyed_permutation import KeyedPermutation
+
+
+def f(yi, yi_plus):
+    return ((yi // 2) + yi_plus) & 1
+
+
+def _choose(*options):
+    """
+    Выбор первого подходящего варианта для всех пар сразу.
+    options — пары (маска, значение); для каждого элемента берется значение
+    первой истинной маски, как в цепочке if/elif.
+    """
+    masks, values = zip(*options)
+    return np.select(masks, values)
+
+
+def pair_positions(width: int, total_pairs: int, start: int, stop: int, seed: int = None):
+    """
+    Координаты пар с номерами start..stop-1: без ключа пары идут в порядке row-major,
+    с ключом — в порядке ключевой перестановки пар (см. KeyedPermutation).
+    :return: (ys1, xs1, ys2, xs2)
+    """
+    if seed is None:
+        pairs = np.arange(start, min(stop, total_pairs))
+    else:
+        pairs = KeyedPermutation(total_pairs, seed).take(start, stop)
+    ys1, xs1 = np.divmod(2 * pairs, width)
+    ys2, xs2 = np.divmod(2 * pairs + 1, width)
+    return ys1, xs1, ys2, xs2
+
+
+def embed_lsbmr_array(pixels: np.ndarray, bits, seed: int = None) -> np.ndarray:
+    """
+    Встраивание LSB Matching Revisited на месте в полутоновый массив формы (h, w).
+    Обрабатываются только пары, в которые попадают биты сообщения (нечетная длина
+    дополняется нулем); порядок пар задает pair_positions.
+    Для всех пар сразу вычисляются f(y1, y2) и кандидаты ±1, выбор делается
+    булевыми масками в том же порядке, что и в поэлементном алгоритме.
+    :return: линейные индексы использованных пикселей
+    """
+    h, w = pixels.shape
+    bits = np.asarray(bits, dtype=np.int16)
+    pairs = -(-len(bits) // 2)
+    message = np.zeros(pairs * 2, dtype=np.int16)
+    message[:len(bits)] = bits
+    m1, m2 = message[0::2], message[1::2]
+
+    ys1, xs1, ys2, xs2 = pair_positions(w, h * w // 2, 0, pairs, seed)
+    pixel1 = pixels[ys1, xs1].astype(np.int16)
+    pixel2 = pixels[ys2, xs2].astype(np.int16)
+
+    # LSB первого пикселя не совпадает с m1: меняем первый пиксель на ±1
+    has_minus1, has_plus1 = pixel1 > 0, pixel1 < 255
+    minus1, plus1 = pixel1 - 1, pixel1 + 1
+    changed1 = _choose(
+        (has_minus1 & (f(minus1, pixel2) == m2), minus1),
+        (has_plus1 & (f(plus1, pixel2) == m2), plus1),
+        (has_plus1, plus1),
+        (has_minus1, minus1),
+        (True, pixel1),
+    )
+
+    # LSB совпадает: при необходимости меняем второй пиксель, для четного предпочитая +1
+    has_minus2, has_plus2 = pixel2 > 0, pixel2 < 255
+    minus2, plus2 = pixel2 - 1, pixel2 + 1
+    fits_minus2 = has_minus2 & (f(pixel1, minus2) == m2)
+    fits_plus2 = has_plus2 & (f(pixel1, plus2) == m2)
+    prefer_plus = pixel2 % 2 == 0
+    changed2 = np.where(
+        prefer_plus,
+        _choose((fits_plus2, plus2), (fits_minus2, minus2), (has_plus2, plus2), (has_minus2, minus2), (True, pixel2)),
+        _choose((fits_minus2, minus2), (fits_plus2, plus2), (has_minus2, minus2), (has_plus2, plus2), (True, pixel2)),
+    )
+    changed2 = np.where(f(pixel1, pixel2) == m2, pixel2, changed2)
+
+    lsb_differs = (pixel1 & 1) != m1
+    pixels[ys1, xs1] = np.where(lsb_differs, changed1, pixel1).astype(np.uint8)
+    pixels[ys2, xs2] = np.where(lsb_differs, pixel2, changed2).astype(np.uint8)
+
+    used_indices = np.empty(pairs * 2, dtype=np.int64)
+    used_indices[0::2] = ys1 * w + xs1
+    used_indices[1::2] = ys2 * w + xs2
+    return used_indices
+
+
+def iter_lsbmr_bits(pixels: np.ndarray, chunk_pairs: int = 4096, seed: int = None):
+    """
+    Извлечение LSB Matching Revisited из полутонового массива формы (h, w) порциями
+    по chunk_pairs пар: m1 = LSB(y1), m2 = f(y1, y2). Читаются только пиксели
+    текущей порции, поэтому генератор можно прервать, как только получено достаточно бит.
+    """
+    h, w = pixels.shape
+    total_pairs = h * w // 2
+    for start in range(0, total_pairs, chunk_pairs):
+        ys1, xs1, ys2, xs2 = pair_positions(w, total_pairs, start, start + chunk_pairs, seed)
+        pixel1, pixel2 = pixels[ys1, xs1], pixels[ys2, xs2]
+
+        bits = np.empty(len(pixel1) * 2, dtype=np.uint8)
+        bits[0::2] = pixel1 & 1
+        bits[1::2] = f(pixel1, pixel2)
+        yield bits
+
+
+def extract_lsbmr_array(pixels: np.ndarray, length_bits: int = None, marker: bytes = None,
+                        chunk_pairs: int = 4096, seed: int = None) -> np.ndarray:
+    """
+    Извлечение LSB Matching Revisited из полутонового массива.
+    Если задан length_bits, извлекается не больше length_bits бит; если задан marker,
+    извлечение останавливается на первом его вхождении.
+    :return: упакованный буфер бит uint8; при заданном marker — байты сообщения без маркера
+             (MarkerDecoder.payload), уже готовые к декодированию
+    """
+    if length_bits is not None:
+        chunk_pairs = max(1, min(chunk_pairs, -(-length_bits // 2)))
+    decoder = MarkerDecoder(marker) if marker is not None else None
+    chunks, received = [], 0
+    for chunk in iter_lsbmr_bits(pixels, chunk_pairs, seed):
+        if length_bits is not None:
+            chunk = chunk[:length_bits - received]
+        received += len(chunk)
+        if decoder is not None:
+            if decoder.feed(chunk):
+                break
+        else:
+            chunks.append(chunk)
+        if length_bits is not None and received >= length_bits:
+            break
+
+    if decoder is not None:
+        return np.frombuffer(decoder.payload(), dtype=np.uint8)
+    return np.packbits(np.concatenate(chunks)) if chunks else np.zeros(0, dtype=np.uint8)
@@ -0,0 +1,125 @@
+import struct
+import numpy as np
+
+
+def _bmp_layout(header):
+    """Разбирает заголовок несжатого BMP: смещение данных, шаг строки, форма и порядок строк"""
+    if header[:2] != b'BM':
+        raise ValueError("Файл не является BMP")
+    data_offset, = struct.unpack_from('<I', header, 10)
+    width, height = struct.unpack_from('<ii', header, 18)
+    bits_per_pixel, compression = struct.unpack_from('<HI', header, 28)
+    if compression != 0:
+        raise ValueError("Поддерживаются только несжатые BMP")
+    if bits_per_pixel not in (8, 24, 32):
+        raise ValueError(f"Неподдерживаемая глубина BMP: {bits_per_pixel} бит")
+    if bits_per_pixel == 8 and not _is_gray_palette(header):
+        # Индексы цветной палитры не являются яркостью: такой BMP декодируется через PIL в RGB
+        raise ValueError("8-битный BMP с цветной палитрой не отображается в память")
+
+    channels = bits_per_pixel // 8
+    row_stride = (width * bits_per_pixel + 31) // 32 * 4
+    bottom_up = height > 0
+    return data_offset, row_stride, abs(height), width, channels, bottom_up
+
+
+def _is_gray_palette(header):
+    """Палитра 8-битного BMP тождественная серая (индекс i -> (i, i, i)), как у PIL-режима L"""
+    dib_size, = struct.unpack_from('<I', header, 14)
+    colors, = struct.unpack_from('<I', header, 46)
+    palette = header[14 + dib_size:14 + dib_size + 4 * (colors or 256)]
+    if len(palette) != 4 * (colors or 256):
+        return False
+    entries = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 4)[:, :3]
+    return bool((entries == np.arange(len(entries))[:, None]).all())
+
+
+def _pnm_layout(header):
+    """Разбирает заголовок бинарного PGM (P5) или PPM (P6)"""
+    magic = header[:2]
+    if magic not in (b'P5', b'P6'):
+        raise ValueError("Поддерживаются только бинарные PGM (P5) и PPM (P6)")
+
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        while header[pos:pos + 1].isspace():
+            pos += 1
+        if header[pos:pos + 1] == b'#':
+            pos = header.index(b'\n', pos) + 1
+            continue
+        start = pos
+        while not header[pos:pos + 1].isspace():
+            pos += 1
+        fields.append(int(header[start:pos]))
+    width, height, max_value = fields
+    if max_value > 255:
+        raise ValueError("Поддерживаются только 8-битные PGM/PPM")
+
+    channels = 1 if magic == b'P5' else 3
+    # После maxval следует ровно один пробельный символ
+    return pos + 1, width * channels, height, width, channels
+
+
+def map_pixels(path, mode='r', shape=None, offset=0):
+    """
+    Отображает пиксели несжатого изображения в память через np.memmap без декодирования.
+    Возвращает представление в том же порядке отсчётов, что и np.array(Image.open(path)):
+    строки сверху вниз, каналы RGB.
+    :param mode: режим np.memmap ('r', 'r+' или 'c' — копирование при записи)
+    :param shape: форма сырого файла (.raw); для BMP/PGM/PPM определяется по заголовку
+    :param offset: смещение пиксельных данных в сыром файле
+    """
+    if shape is not None:
+        return np.memmap(path, dtype=np.uint8, mode=mode, offset=offset, shape=tuple(shape))
+
+    with open(path, 'rb') as file:
+        # Заголовки BMP вместе с палитрой из 256 цветов занимают до 14 + 124 + 1024 байт
+        header = file.read(2048)
+
+    if header[:2] == b'BM':
+        data_offset, row_stride, height, width, channels, bottom_up = _bmp_layout(header)
+        rows = np.memmap(path, dtype=np.uint8, mode=mode, offset=data_offset, shape=(height, row_stride))
+        pixels = rows[:, :width * channels]
+        if bottom_up:
+            pixels = pixels[::-1]
+        if channels == 1:
+            return pixels
+        # BGR/BGRX -> RGB без копирования
+        return pixels.reshape(height, width, channels)[..., 2::-1]
+
+    data_offset, row_size, height, width, channels = _pnm_layout(header)
+    pixels = np.memmap(path, dtype=np.uint8, mode=mode, offset=data_offset, shape=(height, row_size))
+    return pixels if channels == 1 else pixels.reshape(height, width, channels)
+
+
+def create_mapped(path, width, height, channels=3):
+    """
+    Создает несжатый BMP (24 или 8 бит с серой палитрой) или PPM/PGM заданного размера
+    и возвращает его пиксели через np.memmap в режиме записи (см. map_pixels).
+    Позволяет записывать большое изображение полосами, не держа его в памяти целиком.
+    """
+    if channels not in (1, 3):
+        raise ValueError("Поддерживаются 1 или 3 канала")
+    ext = path.lower().rsplit('.', 1)[-1]
+    if ext == 'bmp':
+        row_stride = (width * channels + 3) // 4 * 4
+        palette = bytes(b for value in range(256) for b in (value, value, value, 0)) if channels == 1 else b''
+        data_offset = 14 + 40 + len(palette)
+        file_size = data_offset + row_stride * height
+        header = (struct.pack('<2sIHHI', b'BM', file_size, 0, 0, data_offset)
+                  + struct.pack('<IiiHHIIiiII', 40, width, height, 1, channels * 8, 0,
+                                row_stride * height, 2835, 2835, 256 if channels == 1 else 0, 0)
+                  + palette)
+    elif ext in ('ppm', 'pgm'):
+        if (ext == 'ppm') != (channels == 3):
+            raise ValueError("PPM хранит 3 канала, PGM — 1")
+        header = f"{'P6' if channels == 3 else 'P5'}\n{width} {height}\n255\n".encode('ascii')
+        file_size = len(header) + width * height * channels
+    else:
+        raise ValueError("Поддерживаются только .bmp, .ppm и .pgm")
+
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.truncate(file_size)
+    return map_pixels(path, 'r+')
@@ -0,0 +1,61 @@
+import numpy as np
+
+END_MARKER = b"\xfe\x00\xff\xfa"
+
+
+def text_to_bits_with_marker(text: str) -> np.ndarray:
+    data = text.encode('utf-8', errors='replace')
+    return np.unpackbits(np.frombuffer(data + END_MARKER, dtype=np.uint8))
+
+
+def bits_to_text_with_marker(bits) -> str:
+    decoder = MarkerDecoder()
+    decoder.feed(bits)
+    return decoder.text()
+
+
+class MarkerDecoder:
+    """
+    Инкрементальный декодер сообщения с маркером конца.
+    Принимает биты порциями произвольной длины, упаковывает их в байты через np.packbits
+    и ищет маркер, в том числе на стыке порций. Как только feed вернул True,
+    источник бит можно останавливать.
+    """
+
+    def __init__(self, marker: bytes = END_MARKER):
+        self.marker = marker
+        self.data = bytearray()
+        self.end = -1  # позиция маркера в data или -1, пока он не найден
+        self._pending = np.zeros(0, dtype=np.uint8)  # хвост порции короче байта
+
+    @property
+    def found(self) -> bool:
+        return self.end >= 0
+
+    def feed(self, bits) -> bool:
+        """Добавляет порцию бит; возвращает True, если маркер уже найден"""
+        if self.found:
+            return True
+        bits = np.concatenate([self._pending, np.asarray(bits, dtype=np.uint8)])
+        whole = len(bits) - len(bits) % 8
+        self._pending = bits[whole:]
+
+        search_from = max(0, len(self.data) - len(self.marker) + 1)
+        self.data.extend(np.packbits(bits[:whole]).tobytes())
+        self.end = self.data.find(self.marker, search_from)
+        return self.found
+
+    def payload(self) -> bytes:
+        """Байты до маркера; без маркера — все полученные байты, хвост дополняется нулями"""
+        if self.found:
+            return bytes(self.data[:self.end])
+        return bytes(self.data) + np.packbits(self._pending).tobytes()
+
+    def bits(self) -> np.ndarray:
+        """Полученные биты; при найденном маркере — до конца маркера включительно"""
+        if self.found:
+            return np.unpackbits(np.frombuffer(bytes(self.data[:self.end + len(self.marker)]), dtype=np.uint8))
+        return np.concatenate([np.unpackbits(np.frombuffer(bytes(self.data), dtype=np.uint8)), self._pending])
+
+    def text(self) -> str:
+        return self.payload().decode('utf-8', errors='replace')
@@ -0,0 +1,228 @@
+import numpy as np
+from scipy.ndimage import uniform_filter
+
+
+def as_channels(pixels: np.ndarray) -> np.ndarray:
+    """Представление (h, w, C): у полутонового массива добавляется ось канала"""
+    return pixels[..., None] if pixels.ndim == 2 else pixels
+
+
+def psnr_from_mse(mse, peak: int = 255):
+    """PSNR в dB; при нулевой MSE (изображения совпадают) — бесконечность, без деления на ноль"""
+    mse = np.asarray(mse, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(mse > 0, 10 * np.log10(peak ** 2 / np.maximum(mse, 1e-300)), np.inf)
+
+
+class MetricsAccumulator:
+    """
+    Накопление метрик искажения по частям изображения: полосам строк или выборкам пикселей.
+    Части передаются парами массивов (..., C) или (...) одинаковой формы пикселей;
+    полутоновая часть сравнивается с цветной через broadcast, без копирования каналов.
+    При histograms накапливаются и гистограммы значений каждого канала обоих изображений,
+    по которым result добавляет дивергенции Йенсена — Шеннона (histogram_js, lsb_js).
+    """
+
+    def __init__(self, channels: int, histograms: bool = False):
+        self.abs_sum = np.zeros(channels, dtype=np.int64)
+        self.square_sum = np.zeros(channels, dtype=np.int64)
+        self.changed = np.zeros(channels, dtype=np.int64)
+        self.lsb_changed = np.zeros(channels, dtype=np.int64)
+        self.changed_pixels = 0
+        self.pixels = 0
+        self.histograms = np.zeros((2, channels, 256), dtype=np.int64) if histograms else None
+
+    def update(self, first: np.ndarray, second: np.ndarray):
+        first, second = as_channels(first), as_channels(second)
+        channels = len(self.abs_sum)
+        diff = (first.astype(np.int16) - second).reshape(-1, channels)
+        self.abs_sum += np.abs(diff).sum(axis=0)
+        self.square_sum += np.einsum('ij,ij->j', diff, diff, dtype=np.int64)
+        nonzero = diff != 0
+        self.changed += nonzero.sum(axis=0)
+        self.changed_pixels += int(nonzero.any(axis=1).sum())
+        self.lsb_changed += ((first ^ second) & 1).reshape(-1, channels).sum(axis=0, dtype=np.int64)
+        self.pixels += len(diff)
+        if self.histograms is not None:
+            for image, part in enumerate((first, second)):
+                for c in range(channels):
+                    self.histograms[image, c] += np.bincount(part[..., min(c, part.shape[-1] - 1)].reshape(-1),
+                                                             minlength=256)
+
+    def result(self) -> dict:
+        count = max(self.pixels, 1)
+        mse = self.square_sum / count
+        result = {
+            'pixels': self.pixels,
+            'mad': self.abs_sum / count,
+            'mse': mse,
+            'psnr': psnr_from_mse(mse),
+            'changed': self.changed,
+            'lsb_changed': self.lsb_changed,
+            'lsb_change_rate': self.lsb_changed / count,
+            'changed_pixels': self.changed_pixels,
+        }
+        if self.histograms is not None:
+            first, second = self.histograms
+            result['histogram_js'] = np.array([js_divergence(p, q) for p, q in zip(first, second)])
+            # Распределение LSB выводится из гистограммы: нечетные значения дают LSB = 1
+            result['lsb_js'] = np.array([js_divergence(p.reshape(-1, 2).sum(axis=0), q.reshape(-1, 2).sum(axis=0))
+                                         for p, q in zip(first, second)])
+        return result
+
+
+def distortion_metrics(original: np.ndarray, stego: np.ndarray, indices=None, chunk_rows: int = 256,
+                       histograms: bool = False) -> dict:
+    """
+    Метрики искажения по каналам за один проход по двум массивам uint8 (h, w) или (h, w, C).
+    Полутоновый массив сравнивается с цветным через broadcast, без копирования каналов.
+    Массивы могут быть представлениями буфера QImage или np.memmap: полный проход
+    идет полосами по chunk_rows строк, поэтому промежуточные массивы не растут с изображением.
+    :param indices: линейные индексы пикселей (y * w + x) или булева маска (h, w);
+                    если задана, метрики считаются только по этим пикселям
+    :return: словарь с массивами по каналам: mad (средний модуль разности), mse, psnr,
+             changed (измененные отсчеты), lsb_changed (измененные LSB), lsb_change_rate, а также
+             pixels (число учтенных пикселей) и changed_pixels (пиксели, измененные хотя бы в одном канале);
+             при histograms — еще histogram_js и lsb_js (см. MetricsAccumulator)
+    """
+    original, stego = as_channels(original), as_channels(stego)
+    if original.shape[:2] != stego.shape[:2]:
+        raise ValueError(f"Размеры изображений не совпадают: {original.shape[:2]} vs {stego.shape[:2]}")
+    h, w = original.shape[:2]
+    accumulator = MetricsAccumulator(max(original.shape[2], stego.shape[2]), histograms)
+
+    if indices is not None:
+        indices = np.asarray(indices)
+        indices = np.flatnonzero(indices) if indices.dtype == bool else indices.reshape(-1)
+        ys, xs = np.divmod(indices, w)
+        accumulator.update(original[ys, xs], stego[ys, xs])
+    else:
+        for start in range(0, h, chunk_rows):
+            accumulator.update(original[start:start + chunk_rows], stego[start:start + chunk_rows])
+    return accumulator.result()
+
+
+def box_mean(values: np.ndarray, size: int) -> np.ndarray:
+    """
+    Среднее по всем окнам size × size, целиком лежащим в изображении. Используется
+    разделимый box-фильтр (uniform_filter): стоимость линейна по числу пикселей
+    и не зависит от size.
+    """
+    window = uniform_filter(values, size)
+    first, last = size // 2, (size - 1) // 2
+    return window[first:values.shape[0] - last, first:values.shape[1] - last]
+
+
+def ssim_map(first: np.ndarray, second: np.ndarray, window: int = 7, peak: int = 255) -> np.ndarray:
+    """
+    Значения SSIM одного канала для всех окон window × window, целиком лежащих в изображении
+    (равные веса). Средние, дисперсии и ковариация считаются пятью проходами box_mean;
+    как и в skimage, дисперсии берутся с поправкой на выборку N / (N - 1).
+    """
+    # float64: в float32 ошибки округления выводят SSIM совпадающих изображений за пределы [-1, 1]
+    x = first.astype(np.float64)
+    y = second.astype(np.float64)
+    mu_x, mu_y = box_mean(x, window), box_mean(y, window)
+    correction = window * window / (window * window - 1)
+    mu_xy = mu_x * mu_y
+    mu_x *= mu_x
+    mu_y *= mu_y
+    var_sum = (box_mean(x * x, window) + box_mean(y * y, window) - mu_x - mu_y) * correction
+    cov_xy = (box_mean(x * y, window) - mu_xy) * correction
+
+    c1, c2 = (0.01 * peak) ** 2, (0.03 * peak) ** 2
+    numerator = (2 * mu_xy + c1) * (2 * cov_xy + c2)
+    denominator = (mu_x + mu_y + c1) * (var_sum + c2)
+    numerator /= denominator
+    return np.clip(numerator, -1, 1, out=numerator)
+
+
+def ssim_channel(first: np.ndarray, second: np.ndarray, window: int = 7, peak: int = 255) -> float:
+    """Средний SSIM одного канала; окно уменьшается до размера изображения, если оно меньше"""
+    window = min(window, *first.shape)
+    if window < 2:
+        return 1.0 if np.array_equal(first, second) else 0.0
+    return float(np.mean(ssim_map(first, second, window, peak), dtype=np.float64))
+
+
+class SSIMAccumulator:
+    """
+    Средний SSIM по каналам для изображения, поступающего полосами строк.
+    От предыдущей полосы сохраняются последние window - 1 строк, поэтому учитываются
+    ровно те же окна, что и при расчете по всему изображению, и каждое — один раз.
+    Если задан frame_size (ширина, высота), окно уменьшается до размера изображения,
+    как в ssim_channel; при окне меньше 2 канал сравнивается на полное совпадение.
+    """
+
+    def __init__(self, channels: int, window: int = 7, frame_size=None):
+        if frame_size is not None:
+            window = min(window, *frame_size)
+        self.window = window
+        self.sums = np.zeros(channels)
+        self.counts = np.zeros(channels, dtype=np.int64)
+        self.equal = np.ones(channels, dtype=bool)
+        self.tail = None
+
+    def update(self, first: np.ndarray, second: np.ndarray):
+        first, second = as_channels(first), as_channels(second)
+        if self.window < 2:
+            for c in range(len(self.sums)):
+                self.equal[c] &= np.array_equal(first[..., min(c, first.shape[2] - 1)],
+                                                second[..., min(c, second.shape[2] - 1)])
+            return
+        if self.tail is not None:
+            first = np.concatenate([self.tail[0], first])
+            second = np.concatenate([self.tail[1], second])
+        keep = self.window - 1
+        self.tail = (first[len(first) - keep:], second[len(second) - keep:])
+        if len(first) < self.window or first.shape[1] < self.window:
+            return
+        for c in range(len(self.sums)):
+            values = ssim_map(first[..., min(c, first.shape[2] - 1)],
+                              second[..., min(c, second.shape[2] - 1)], self.window)
+            self.sums[c] += values.sum(dtype=np.float64)
+            self.counts[c] += values.size
+
+    def result(self) -> np.ndarray:
+        if self.window < 2:
+            return self.equal.astype(np.float64)
+        with np.errstate(invalid='ignore'):
+            return self.sums / self.counts
+
+
+def js_divergence(p: np.ndarray, q: np.ndarray) -> float:
+    """Дивергенция Йенсена — Шеннона (в битах, от 0 до 1) между двумя гистограммами"""
+    p = p / max(p.sum(), 1)
+    q = q / max(q.sum(), 1)
+    m = (p + q) / 2
+
+    def kl(a):
+        mask = a > 0
+        return np.sum(a[mask] * np.log2(a[mask] / m[mask]))
+
+    return float((kl(p) + kl(q)) / 2)
+
+
+def quality_metrics(original: np.ndarray, stego: np.ndarray, window: int = 7, chunk_rows: int = 256) -> dict:
+    """
+    Полный набор метрик качества для уже загруженных массивов: метрики искажения
+    по каналам (см. distortion_metrics), SSIM по каналам, дивергенция Йенсена — Шеннона
+    гистограмм яркости и LSB-плоскостей каждого канала. Все метрики накапливаются
+    за один проход полосами по chunk_rows строк (MetricsAccumulator, SSIMAccumulator),
+    поэтому промежуточные массивы float64 для SSIM ограничены размером полосы.
+    """
+    original, stego = as_channels(original), as_channels(stego)
+    if original.shape[:2] != stego.shape[:2]:
+        raise ValueError(f"Размеры изображений не совпадают: {original.shape[:2]} vs {stego.shape[:2]}")
+    h, w = original.shape[:2]
+    channels = max(original.shape[2], stego.shape[2])
+    accumulator = MetricsAccumulator(channels, histograms=True)
+    ssim = SSIMAccumulator(channels, window, (w, h))
+    for start in range(0, h, chunk_rows):
+        first, second = original[start:start + chunk_rows], stego[start:start + chunk_rows]
+        accumulator.update(first, second)
+        ssim.update(first, second)
+
+    metrics = accumulator.result()
+    metrics['ssim'] = ssim.result()
+    return metrics
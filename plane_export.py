@@ -0,0 +1,147 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PIL import Image
+from bit_planes import bit_planes, channel_names, plane_source
+from image_files import MAPPED_EXTENSIONS, find_images, available_cores
+from mapped_image import map_pixels
+
+
+def read_pixels(path):
+    """
+    Пиксели изображения без приведения к оттенкам серого: (h, w), (h, w, 3) или (h, w, 4).
+    Несжатые BMP/PGM/PPM отображаются в память (np.memmap). Остальные форматы (PNG, TIFF, JPEG,
+    BMP с палитрой) декодируются через PIL целиком в память; для изображений больше
+    2 · Image.MAX_IMAGE_PIXELS PIL выбрасывает Image.DecompressionBombError.
+    """
+    if os.path.splitext(path)[1].lower() in MAPPED_EXTENSIONS:
+        try:
+            return map_pixels(path)
+        except ValueError:
+            pass
+    with Image.open(path) as image:
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        return np.asarray(image)
+
+
+def plane_file_name(base_name, bit, channel_name=None, mode="plane"):
+    """Имя файла плоскости; для полутонового изображения — <имя>_bit_<n>.bmp"""
+    parts = [base_name]
+    if channel_name is not None:
+        parts.append(channel_name)
+    if mode != "plane":
+        parts.append(mode)
+    if mode != "diff":
+        parts.append(f"bit_{bit}")
+    return "_".join(parts) + ".bmp"
+
+
+def save_plane(values, bit, path):
+    """Вычисляет одну битовую плоскость и записывает ее в BMP; ошибки возвращаются в результате"""
+    result = {'output': path, 'status': 'ok'}
+    try:
+        Image.fromarray(bit_planes(values, [bit])[0]).save(path, 'BMP')
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def build_jobs(input_folder, output_folder):
+    """
+    Задания выгрузки для всех изображений папки. Имена плоскостей строятся по имени файла
+    без расширения; если оно совпадает у нескольких файлов (a.png и a.bmp), в него добавляется
+    исходное расширение (a_png_R_bit_0.bmp). Оставшиеся совпадения помечаются ошибкой,
+    чтобы два процесса не писали в одни и те же файлы.
+    """
+    paths = find_images(input_folder)
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    claimed = {}
+    for stem in stems:
+        claimed[os.path.normcase(stem)] = claimed.get(os.path.normcase(stem), 0) + 1
+
+    jobs, owners = [], {}
+    for path, stem in zip(paths, stems):
+        base_name = stem
+        if claimed[os.path.normcase(stem)] > 1:
+            base_name += '_' + os.path.splitext(path)[1][1:].lower()
+        job = {'image': path, 'output': output_folder, 'base_name': base_name}
+        key = os.path.normcase(base_name)
+        if key in owners:
+            job['error'] = f"Плоскости {base_name}_* уже записываются заданием для {owners[key]}"
+        else:
+            owners[key] = path
+        jobs.append(job)
+    return jobs
+
+
+def export_image_planes(job):
+    """
+    Записывает все битовые плоскости всех каналов одного изображения в job['output'].
+    Плоскости канала считаются одним сдвигом с broadcast (см. bit_planes).
+    Имена файлов начинаются с job['base_name'] (по умолчанию — имя файла без расширения).
+    """
+    result = {'image': job['image'], 'status': 'ok', 'files': 0}
+    start = time.perf_counter()
+    try:
+        if 'error' in job:
+            raise ValueError(job['error'])
+        pixels = read_pixels(job['image'])
+        base_name = job.get('base_name') or os.path.splitext(os.path.basename(job['image']))[0]
+        names = channel_names(pixels)
+        for channel, name in enumerate(names):
+            planes = bit_planes(plane_source(pixels, channel))
+            for bit in range(8):
+                file_name = plane_file_name(base_name, bit, name if len(names) > 1 else None)
+                Image.fromarray(planes[bit]).save(os.path.join(job['output'], file_name), 'BMP')
+                result['files'] += 1
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def process_pool(workers=None):
+    """
+    Пул процессов для пакетной выгрузки. Используется запуск spawn: пул может
+    создаваться из потока GUI, а fork процесса с запущенными потоками Qt небезопасен.
+    """
+    return ProcessPoolExecutor(max_workers=workers or available_cores(),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная выгрузка битовых плоскостей изображений папки")
+    parser.add_argument('--input', required=True, help="папка с изображениями")
+    parser.add_argument('--output', required=True, help="папка для плоскостей")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    parser.add_argument('--log', default='planes.jsonl', help="журнал результатов JSON lines")
+    args = parser.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+
+    jobs = build_jobs(args.input, args.output)
+    succeeded = 0
+    started = time.perf_counter()
+    with open(args.log, 'a', encoding='utf-8') as log, process_pool(args.workers) as pool:
+        futures = [pool.submit(export_image_planes, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            log.write(json.dumps(result, ensure_ascii=False) + "\n")
+            if result['status'] == 'ok':
+                succeeded += 1
+            else:
+                print(f"[{done}/{len(jobs)}] Ошибка: {result['error']}", file=sys.stderr)
+    print(f"Обработано: {succeeded}/{len(jobs)} за {time.perf_counter() - started:.2f} с")
+    return 0 if succeeded == len(jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import numpy as np
+from PyQt6.QtGui import QImage
+
+
+def qimage_view(image: QImage, channels: int, writable: bool = False) -> np.ndarray:
+    """
+    Представление буфера QImage в виде массива NumPy без копирования.
+    Строки QImage выровнены до bytesPerLine, поэтому хвост каждой строки отбрасывается срезом.
+    При writable=True изменения массива попадают прямо в изображение.
+    """
+    ptr = image.bits() if writable else image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    pixels = rows[:, :image.width() * channels]
+    if channels == 1:
+        return pixels
+    return pixels.reshape(image.height(), image.width(), channels)
+
+
+def array_to_qimage(pixels: np.ndarray) -> QImage:
+    """
+    QImage поверх массива uint8 без копирования: (h, w) — Grayscale8, (h, w, 3) — RGB888,
+    (h, w, 4) — RGBA8888.
+    QImage не владеет буфером, поэтому массив сохраняется в атрибуте изображения;
+    для независимого от массива изображения используйте .copy().
+    """
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    if pixels.ndim == 2:
+        image_format = QImage.Format.Format_Grayscale8
+    elif pixels.shape[2] == 3:
+        image_format = QImage.Format.Format_RGB888
+    elif pixels.shape[2] == 4:
+        image_format = QImage.Format.Format_RGBA8888
+    else:
+        raise ValueError("Поддерживаются массивы формы (h, w), (h, w, 3) и (h, w, 4)")
+    image = QImage(pixels.data, width, height, pixels.strides[0], image_format)
+    image._array = pixels
+    return image
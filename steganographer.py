@@ -1,58 +1,228 @@
 import numpy as np
 from PIL import Image
+from scipy.stats import chi2
+import io
 import os
+import shutil
+from mapped_image import map_pixels, create_mapped
+from image_files import MAPPED_EXTENSIONS
+from metrics import quality_metrics, psnr_from_mse, MetricsAccumulator, SSIMAccumulator, as_channels
 
 class Steganographer:
-    def __init__(self, image_path):
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Файл {image_path} не найден")
-        self.image = Image.open(image_path)
-        self.pixels = np.array(self.image)
-        
-        if self.pixels.dtype != np.uint8:
-            self.pixels = self.pixels.astype(np.uint8)
+    BLOCK_SIZE = 64  # бит данных в блоке улучшенного метода
+    HASH_SIZE = 16  # бит хэша на каждый блок
+    KEY_BITS_PER_COUNTER = 256  # бит ключа на одно значение счётчика Philox4x64
+    MAX_BITS_PER_SAMPLE = 4  # максимальное число младших битовых плоскостей (k-LSB)
+    
+    def __init__(self, source):
+        """
+        Создает экземпляр из пути к файлу, PIL.Image, массива NumPy,
+        байтов/memoryview с закодированным изображением или файлового объекта
+        """
+        self.image = None  # отсутствует, если экземпляр создан из массива
+        self._pixels = None  # массив пикселей декодируется при первом обращении
+        self.mapped_path = None  # путь к файлу, если пиксели отображены в память (from_mapped)
+        self._map_options = {}
+        
+        if isinstance(source, Image.Image):
+            self.image = source
+        elif isinstance(source, np.ndarray):
+            # uint8 используется как есть, без копирования
+            self._pixels = source if source.dtype == np.uint8 else source.astype(np.uint8)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.image = Image.open(io.BytesIO(source))
+        elif hasattr(source, 'read'):
+            # Файл может быть закрыт сразу после создания экземпляра: декодируем, пока он открыт
+            self.image = Image.open(source)
+            self.image.load()
+        else:
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Файл {source} не найден")
+            self.image = Image.open(source)
+    
+    @property
+    def pixels(self):
+        if self._pixels is None:
+            self._pixels = np.array(self.image)
+            if self._pixels.dtype != np.uint8:
+                self._pixels = self._pixels.astype(np.uint8)
+        return self._pixels
+    
+    @pixels.setter
+    def pixels(self, value):
+        self._pixels = value
+    
+    @property
+    def sample_count(self):
+        """Число отсчётов (пиксели × каналы), не требующее декодирования всего массива"""
+        if self._pixels is not None or self.image is None:
+            return self._pixels.size
+        return self.image.width * self.image.height * len(self.image.getbands())
     
     @classmethod
     def from_image(cls, image):
         """Создает экземпляр из объекта PIL.Image"""
-        import tempfile
-        temp_path = "temp_stego_image.png"
-        image.save(temp_path)
-        instance = cls(temp_path)
-        os.remove(temp_path)
-        if instance.pixels.dtype != np.uint8:
-            instance.pixels = instance.pixels.astype(np.uint8)
+        return cls(image)
+    
+    @classmethod
+    def from_buffer(cls, buffer, shape):
+        """Создает экземпляр из сырого буфера пикселей uint8 заданной формы без копирования"""
+        return cls(np.frombuffer(buffer, dtype=np.uint8).reshape(shape))
+    
+    @classmethod
+    def from_mapped(cls, path, mode='r', shape=None, offset=0):
+        """Создает экземпляр над np.memmap несжатого BMP/PGM/PPM/raw-файла без декодирования"""
+        instance = cls(map_pixels(path, mode, shape, offset))
+        instance.mapped_path = path
+        instance._map_options = {'shape': shape, 'offset': offset}
         return instance
     
+    @property
+    def frame_size(self):
+        """Размер изображения (ширина, высота) без декодирования пикселей"""
+        if self._pixels is not None or self.image is None:
+            return self._pixels.shape[1], self._pixels.shape[0]
+        return self.image.size
+    
+    def iter_pixel_rows(self, start_row=0, stop_row=None, chunk_rows=256):
+        """
+        Отдает строки пикселей блоками по chunk_rows строк: срезами уже загруженного
+        (или отображенного в память) массива, иначе — вырезая полосы из PIL-изображения.
+        Image.crop при первом вызове декодирует все изображение, поэтому без memmap
+        экономится только копия в массив NumPy, а не сами пиксели.
+        """
+        width, height = self.frame_size
+        stop_row = height if stop_row is None else min(stop_row, height)
+        for top in range(start_row, stop_row, chunk_rows):
+            bottom = min(top + chunk_rows, stop_row)
+            if self._pixels is not None:
+                yield self._pixels[top:bottom]
+                continue
+            chunk = np.asarray(self.image.crop((0, top, width, bottom)))
+            yield chunk if chunk.dtype == np.uint8 else chunk.astype(np.uint8)
+    
+    def _check_bits_per_sample(self, k):
+        if not 1 <= k <= self.MAX_BITS_PER_SAMPLE:
+            raise ValueError(f"Число бит на отсчёт должно быть от 1 до {self.MAX_BITS_PER_SAMPLE}, получено {k}")
+    
+    def read_lsb(self, start, count, k=1):
+        """Читает k младших бит отсчётов [start, start + count) плоского массива пикселей"""
+        self._check_bits_per_sample(k)
+        count = max(0, min(count, self.sample_count - start))
+        if self._pixels is not None:
+            row_size = self._pixels[0].size
+        else:
+            row_size = self.sample_count // self.image.height
+        first_row = start // row_size
+        last_row = -(-(start + count) // row_size)
+        offset = start - first_row * row_size
+        
+        if self._pixels is not None:
+            # Для непрерывного массива это представление, для memmap-вида копируются только нужные строки
+            samples = self._pixels[first_row:last_row].reshape(-1)
+        else:
+            # Массив еще не декодирован: читаем только строки, покрывающие диапазон
+            rows = [chunk.reshape(-1) for chunk in self.iter_pixel_rows(first_row, last_row)]
+            samples = np.concatenate(rows) if rows else np.zeros(0, dtype=np.uint8)
+        values = samples[offset:offset + count] & ((1 << k) - 1)
+        if k == 1:
+            return values.astype(np.uint8)
+        # Разворачиваем k бит каждого отсчёта, старший бит первым
+        return ((values[:, None] >> np.arange(k - 1, -1, -1, dtype=np.uint8)) & 1).astype(np.uint8).reshape(-1)
+    
+    def _read_bits(self, length_bits, k=1):
+        """Читает первые length_bits бит сообщения при k битах на отсчёт"""
+        return self.read_lsb(0, -(-length_bits // k), k)[:length_bits]
+    
     def text_to_bits(self, text):
         byte_array = text.encode('utf-8')
         return np.unpackbits(np.frombuffer(byte_array, dtype=np.uint8))
     
     def generate_key(self, seed, length):
-        np.random.seed(seed)
-        return np.random.randint(0, 2, length)
+        return self.keystream(seed, 0, length)
+    
+    def keystream(self, seed, offset, length):
+        """Возвращает биты ключа для окна [offset, offset + length) без генерации префикса"""
+        # Philox — счётчиковый генератор: каждое значение счётчика дает 4 слова по 64 бита,
+        # поэтому к нужному окну можно перейти сразу, не трогая глобальное состояние np.random
+        first = offset // self.KEY_BITS_PER_COUNTER
+        last = -(-(offset + length) // self.KEY_BITS_PER_COUNTER)
+        bit_generator = np.random.Philox(key=seed, counter=first)
+        words = bit_generator.random_raw((last - first) * 4).astype('<u8')
+        bits = np.unpackbits(words.view(np.uint8), bitorder='little')
+        
+        start = offset - first * self.KEY_BITS_PER_COUNTER
+        return bits[start:start + length]
+    
+    def _write_lsb(self, pixels, bits, k=1):
+        """Записывает биты в k младших бит первых отсчётов pixels на месте, затрагивая только нужные строки"""
+        self._check_bits_per_sample(k)
+        count = min(-(-len(bits) // k), pixels.size)
+        last_row = -(-count // pixels[0].size)
+        rows = pixels[:last_row]
+        flat_pixels = rows.reshape(-1)
+        
+        values = np.zeros(count * k, dtype=np.uint8)
+        values[:min(len(bits), count * k)] = np.asarray(bits[:count * k], dtype=np.uint8) & 1
+        if k > 1:
+            # Группы по k бит (старший первым) собираем в значения младших битовых плоскостей
+            values = (values.reshape(count, k) << np.arange(k - 1, -1, -1, dtype=np.uint8)).sum(axis=1, dtype=np.uint8)
+        
+        # Для k = 1 маска 0xFE = 11111110: обнуляем младшие биты и записываем новые, не выходя за uint8
+        target = flat_pixels[:count]
+        target &= (0xFF << k) & 0xFF
+        target |= values
+        if not np.may_share_memory(flat_pixels, rows):
+            rows[...] = flat_pixels.reshape(rows.shape)
+    
+    def _embed_bits(self, bits, k=1):
+        """Записывает биты в k младших бит копии пикселей (лишние биты отбрасываются)"""
+        new_pixels = self.pixels.copy()
+        self._write_lsb(new_pixels, bits, k)
+        return new_pixels
     
-    def embed_basic(self, text, seed):
+    def _basic_bits(self, text, seed):
         bits = self.text_to_bits(text)
         key = self.generate_key(seed, len(bits))
-        encoded = np.bitwise_xor(bits, key)
-        
-        flat_pixels = self.pixels.flatten().astype(np.int32)
-        
-        for i in range(len(encoded)):
-            if i < len(flat_pixels):
-                new_value = (flat_pixels[i] & 0xFE) | encoded[i]  # 0xFE = 11111110
-                flat_pixels[i] = np.clip(new_value, 0, 255)
-        
-        new_pixels = flat_pixels.reshape(self.pixels.shape).astype(np.uint8)
-        return Image.fromarray(new_pixels)
+        return np.bitwise_xor(bits, key)
+    
+    def embed_basic(self, text, seed, k=1):
+        return Image.fromarray(self._embed_bits(self._basic_bits(text, seed), k))
     
     def linear_hash(self, data_block, a=101, b=103, p=2**16+1):
         return (a * int.from_bytes(data_block, 'big') + b) % p
     
-    def embed_enhanced(self, text, seed):
-        text_bits = np.unpackbits(np.frombuffer(text.encode('utf-8'), dtype=np.uint8))
-        length_bits = np.array([int(bit) for bit in f"{len(text_bits):032b}"], dtype=np.uint8)
+    def block_hashes(self, blocks, a=101, b=103, p=2**16+1):
+        """Вычисляет linear_hash сразу для всех блоков массива формы (n_blocks, BLOCK_SIZE)"""
+        block_bytes = np.packbits(blocks, axis=1).astype(np.int64)
+        # Значение блока по модулю p считаем через веса 256^k mod p, чтобы не выйти за int64
+        weights = np.array([pow(256, k, p) for k in range(block_bytes.shape[1] - 1, -1, -1)], dtype=np.int64)
+        values = (block_bytes * weights).sum(axis=1) % p
+        return (a * values + b) % p
+    
+    def protect_blocks(self, bits):
+        """Дополняет биты до целого числа блоков и дописывает к каждому блоку его хэш"""
+        n_blocks = -(-len(bits) // self.BLOCK_SIZE)
+        blocks = np.zeros((n_blocks, self.BLOCK_SIZE), dtype=np.uint8)
+        blocks.reshape(-1)[:len(bits)] = bits
+        
+        hashes = self.block_hashes(blocks)
+        hash_bits = ((hashes[:, None] >> np.arange(self.HASH_SIZE)) & 1).astype(np.uint8)
+        return np.hstack([blocks, hash_bits]).reshape(-1)
+    
+    def verify_blocks(self, bits):
+        """Проверяет хэши блоков; возвращает биты данных и маску прошедших проверку блоков"""
+        frames = np.asarray(bits, dtype=np.uint8).reshape(-1, self.BLOCK_SIZE + self.HASH_SIZE)
+        blocks = frames[:, :self.BLOCK_SIZE]
+        hash_bits = frames[:, self.BLOCK_SIZE:].astype(np.int64)
+        
+        extracted = (hash_bits << np.arange(self.HASH_SIZE)).sum(axis=1)
+        computed = self.block_hashes(blocks) & ((1 << self.HASH_SIZE) - 1)
+        return blocks.reshape(-1), extracted == computed
+    
+    def _enhanced_bits(self, text, seed):
+        text_bits = self.text_to_bits(text)
+        length_bits = np.unpackbits(np.array([len(text_bits)], dtype='>u4').view(np.uint8))
         
         all_bits = np.concatenate([length_bits, text_bits])
         key_text = self.generate_key(seed, len(all_bits))
@@ -60,27 +230,32 @@ class Steganographer:
         print("Встроенная длинна", len(text_bits))
         encoded_text = np.bitwise_xor(all_bits, key_text)
         
-        block_size = 64
-        blocks = [encoded_text[i:i+block_size] for i in range(0, len(encoded_text), block_size)]
-        enhanced_data = []
-        
-        for block in blocks:
-            block_bytes = np.packbits(block).tobytes()
-            block_hash = self.linear_hash(block_bytes)
-            hash_bits = np.array([(block_hash >> i) & 1 for i in range(16)], dtype=np.uint8)
-            enhanced_data.extend(block)
-            enhanced_data.extend(hash_bits)
-        
+        enhanced_data = self.protect_blocks(encoded_text)
         key_full = self.generate_key(seed, len(enhanced_data))
         
-        final_bits = np.bitwise_xor(enhanced_data, key_full)
-        
-        flat_pixels = self.pixels.flatten()
-        for i in range(len(final_bits)):
-            if i < len(flat_pixels):
-                flat_pixels[i] = (flat_pixels[i] & 0xFE) | final_bits[i]
-        
-        return Image.fromarray(self.pixels)
+        # Ключи с одним seed совпадают в начале, поэтому заголовок длины
+        # оказывается в LSB в открытом виде и читается без ключа
+        return np.bitwise_xor(enhanced_data, key_full)
+    
+    def embed_enhanced(self, text, seed, k=1):
+        return Image.fromarray(self._embed_bits(self._enhanced_bits(text, seed), k))
+    
+    def embed_to_file(self, text, seed, output_path, method="enhanced", k=1):
+        """
+        Встраивает текст в копию отображенного в память файла-контейнера.
+        Изменяются только строки, в которые попадают биты сообщения, поэтому
+        пиковое потребление памяти определяется размером сообщения, а не изображения.
+        """
+        if self.mapped_path is None:
+            raise ValueError("Встраивание в файл доступно только для экземпляров из from_mapped")
+        bits = self._basic_bits(text, seed) if method == "basic" else self._enhanced_bits(text, seed)
+        
+        shutil.copyfile(self.mapped_path, output_path)
+        output = map_pixels(output_path, mode='r+', **self._map_options)
+        self._write_lsb(output, bits, k)
+        output.flush()
+        del output
+        return type(self).from_mapped(output_path, **self._map_options)
 
     def calculate_capacity(self, text, method="enhanced"):
         """Вычисляет требуемое количество бит для встраивания текста"""
@@ -89,12 +264,43 @@ class Steganographer:
         if method == "basic":
             return text_bits
         else:
-            blocks = (text_bits + 63) // 64  
-            return text_bits + blocks * 16
+            blocks = (32 + text_bits + self.BLOCK_SIZE - 1) // self.BLOCK_SIZE
+            return blocks * (self.BLOCK_SIZE + self.HASH_SIZE)
+    
+    def expected_psnr(self, samples_used, k=1):
+        """
+        Ожидаемый PSNR (в том же смысле, что и в compare_containers) после замены
+        k младших бит в samples_used отсчётах случайными битами сообщения
+        """
+        # Для независимых равномерных a, b из [0, 2^k) E[(a - b)^2] = (4^k - 1) / 6
+        mse = samples_used * (4 ** k - 1) / 6 / self.sample_count
+        return float('inf') if mse == 0 else 10 * np.log10(255**2 / mse)
     
-    def extract_basic(self, seed, length_bits):
-        flat_pixels = self.pixels.flatten()
-        extracted_bits = [pixel & 1 for pixel in flat_pixels[:length_bits]]
+    def plan_capacity(self, text, method="enhanced"):
+        """
+        Планирует встраивание для k = 1..MAX_BITS_PER_SAMPLE: сколько отсчётов будет занято,
+        ожидаемый PSNR и минимальное k, при котором сообщение помещается в изображение
+        """
+        required_bits = self.calculate_capacity(text, method)
+        plans = {}
+        for k in range(1, self.MAX_BITS_PER_SAMPLE + 1):
+            samples = -(-required_bits // k)
+            plans[k] = {
+                'samples': samples,
+                'fits': samples <= self.sample_count,
+                'psnr': self.expected_psnr(samples, k)
+            }
+        
+        fitting = [k for k, plan in plans.items() if plan['fits']]
+        return {
+            'required_bits': required_bits,
+            'available_samples': self.sample_count,
+            'plans': plans,
+            'min_k': fitting[0] if fitting else None
+        }
+    
+    def extract_basic(self, seed, length_bits, k=1):
+        extracted_bits = self._read_bits(length_bits, k)
         
         key = self.generate_key(seed, len(extracted_bits))
         decoded_bits = np.bitwise_xor(extracted_bits, key)
@@ -105,161 +311,252 @@ class Steganographer:
         except UnicodeDecodeError:
             return "Ошибка декодирования"
 
-    def extract_enhanced(self, seed):
-        length_bits = (self.pixels.flatten()[:32] & 1).astype(np.uint8)
-        msg_length = int(''.join(map(str, length_bits)), 2)
-        key = self.generate_key(seed, 32 + msg_length)
+    def extract_enhanced(self, seed, k=1):
+        """Извлекает текст; возвращает текст и маску блоков, прошедших проверку хэша"""
+        length_bits = self._read_bits(32, k)
+        msg_length = int(np.packbits(length_bits).view('>u4')[0])
         print("Биты длинна", length_bits)
         print("Извлечённая длинна", msg_length)
-        extracted_bits = (self.pixels.flatten()[:32 + msg_length] & 1)
-        decoded_bits = np.bitwise_xor(extracted_bits, key)[32:]
-               
-        block_size = 64
-        hash_size = 16
-        result = bytearray()
-        error_count = 0 
-        
-        for i in range(0, len(decoded_bits), block_size + hash_size):
-            if i + block_size > len(decoded_bits):
-                break
-            
-            data_bits = decoded_bits[i:i+block_size]
-            
-            if i + block_size + hash_size <= len(decoded_bits):
-                hash_bits = decoded_bits[i+block_size:i+block_size+hash_size]
-                extracted_hash = sum(bit << j for j, bit in enumerate(hash_bits))
-                
-                data_bytes = np.packbits(data_bits).tobytes()
-                computed_hash = self.linear_hash(data_bytes)
-                
-                if computed_hash != extracted_hash:
-                    error_count += 1
-            
-            key_text = self.generate_key(seed, block_size)
-            clean_bits = np.bitwise_xor(data_bits, key_text)
-            result.extend(np.packbits(clean_bits).tobytes())
+        
+        frame_size = self.BLOCK_SIZE + self.HASH_SIZE
+        n_blocks = -(-(32 + msg_length) // self.BLOCK_SIZE)
+        if n_blocks * frame_size > self.sample_count * k:
+            raise ValueError(f"Заголовок указывает длину {msg_length} бит, что превышает ёмкость изображения")
+        
+        extracted_bits = self._read_bits(n_blocks * frame_size, k)
+        key_full = self.generate_key(seed, len(extracted_bits))
+        data_bits, block_ok = self.verify_blocks(np.bitwise_xor(extracted_bits, key_full))
+        
+        key_text = self.generate_key(seed, 32 + msg_length)
+        clean_bits = np.bitwise_xor(data_bits[:32 + msg_length], key_text)[32:]
+        result = np.packbits(clean_bits).tobytes()
         
         try:
             decoded_text = result.decode('utf-8')
         except UnicodeDecodeError:
             decoded_text = result.decode('utf-8', errors='replace')
         
-        return decoded_text, error_count
+        return decoded_text, block_ok
 
+    def _load_pixels(self, source):
+        """Возвращает пиксели из пути, PIL.Image, массива, буфера или другого Steganographer"""
+        if isinstance(source, Steganographer):
+            return source.pixels
+        return type(self)(source).pixels
+    
+    def _open_rows(self, source):
+        """Экземпляр для построчного чтения: несжатые BMP/PGM/PPM через memmap, остальные через PIL (декодируются целиком)"""
+        if isinstance(source, Steganographer):
+            return source
+        if isinstance(source, (str, os.PathLike)) and os.path.splitext(source)[1].lower() in MAPPED_EXTENSIONS:
+            try:
+                return type(self).from_mapped(source)
+            except ValueError:
+                pass
+        return type(self)(source)
+    
+    @staticmethod
+    def _highlight(original, stego):
+        """Красный — изменен LSB хотя бы одного канала, зеленый и синий — половина яркости оригинала"""
+        changes = ((as_channels(original) & 1) != (as_channels(stego) & 1)).any(axis=-1)
+        highlight = np.empty((*changes.shape, 3), dtype=np.uint8)
+        highlight[..., 0] = changes * np.uint8(255)
+        if original.ndim == 3:
+            highlight[..., 1] = original[..., 1] // 2
+            highlight[..., 2] = original[..., 2] // 2
+        else:
+            highlight[..., 1] = original // 2
+            highlight[..., 2] = original // 2
+        return highlight
+    
+    def compare_streaming(self, original_source, stego_source, highlight_path=None, strip_rows=256, window=7):
+        """
+        Сравнение изображений полосами по strip_rows строк. Целиком в память не загружаются
+        только несжатые BMP/PGM/PPM: они читаются через memmap. Остальные форматы (PNG, TIFF,
+        JPEG) PIL декодирует полностью при вырезании первой полосы, так что для них полосы
+        ограничивают лишь промежуточные массивы метрик. MSE, изменения LSB и SSIM накапливаются
+        по полосам вместе с гистограммами каналов; карта изменений (как в visualize_changes)
+        записывается полосами в highlight_path (.bmp, .ppm), если он задан.
+        :return: словарь с теми же ключами, что и compare_containers
+        """
+        original = self._open_rows(original_source)
+        stego = self._open_rows(stego_source)
+        if original.frame_size != stego.frame_size:
+            raise ValueError(f"Размеры изображений не совпадают: {original.frame_size} vs {stego.frame_size}")
+        width, height = original.frame_size
+        
+        accumulator = ssim = output = None
+        strips = zip(original.iter_pixel_rows(chunk_rows=strip_rows), stego.iter_pixel_rows(chunk_rows=strip_rows))
+        top = 0
+        for first, second in strips:
+            if accumulator is None:
+                if first.ndim == second.ndim == 3 and first.shape[2] != second.shape[2]:
+                    raise ValueError(f"Число каналов не совпадает: {first.shape[2]} vs {second.shape[2]}")
+                channels = max(first.shape[2] if first.ndim == 3 else 1, second.shape[2] if second.ndim == 3 else 1)
+                accumulator = MetricsAccumulator(channels, histograms=True)
+                ssim = SSIMAccumulator(channels, window, (width, height))
+                if highlight_path is not None:
+                    output = create_mapped(highlight_path, width, height, 3)
+            accumulator.update(first, second)
+            ssim.update(first, second)
+            if output is not None:
+                output[top:top + len(first)] = self._highlight(first, second)
+            top += len(first)
+        if output is not None:
+            output.flush()
+            del output
+        
+        channel_metrics = accumulator.result()
+        channel_metrics['ssim'] = ssim.result()
+        mse = float(np.mean(channel_metrics['mse']))
+        return {
+            'mse': mse,
+            'psnr': float(psnr_from_mse(mse)),
+            'changed_pixels': int(channel_metrics['changed'].sum()),
+            'lsb_changes': int(channel_metrics['lsb_changed'].sum()),
+            'ssim': float(np.mean(channel_metrics['ssim'])),
+            'channels': {
+                key: channel_metrics[key].tolist()
+                for key in ('mse', 'psnr', 'ssim', 'histogram_js', 'lsb_js', 'lsb_change_rate')
+            }
+        }
+    
     def compare_containers(self, original_image_path, stego_image_path):
-        """Сравнивает оригинальное и стего-изображение с автоматической конвертацией форматов"""
-        original = np.array(Image.open(original_image_path))
-        stego = np.array(Image.open(stego_image_path))
-        
-        if len(original.shape) != len(stego.shape):
-            if len(original.shape) == 3:
-                stego = np.stack((stego,)*3, axis=-1)
-            else:
-                original = np.stack((original,)*3, axis=-1)
+        """
+        Сравнивает оригинальное и стего-изображение: MSE, PSNR, число изменений, SSIM,
+        а в 'channels' — метрики по каналам (см. metrics.quality_metrics).
+        Принимает пути, массивы или объекты Steganographer; уже загруженные пиксели не декодируются повторно.
+        """
+        original = self._load_pixels(original_image_path)
+        stego = self._load_pixels(stego_image_path)
         
-        if original.shape != stego.shape:
+        # Полутоновое изображение сравнивается с цветным через broadcast (см. metrics.distortion_metrics)
+        if original.ndim == stego.ndim and original.shape != stego.shape:
             raise ValueError(f"Размеры изображений не совпадают: {original.shape} vs {stego.shape}")
         
-        original_int = original.astype(np.int32)
-        stego_int = stego.astype(np.int32)
-        
-        diff = original_int - stego_int
+        channel_metrics = quality_metrics(original, stego)
+        mse = float(np.mean(channel_metrics['mse']))
         
         metrics = {
-            'mse': np.mean(diff**2),
-            'psnr': 10 * np.log10(255**2 / np.mean(diff**2)),
-            'changed_pixels': np.sum(diff != 0),
-            'lsb_changes': np.sum((original & 1) != (stego & 1))
+            'mse': mse,
+            'psnr': float(psnr_from_mse(mse)),
+            'changed_pixels': int(channel_metrics['changed'].sum()),
+            'lsb_changes': int(channel_metrics['lsb_changed'].sum()),
+            'ssim': float(np.mean(channel_metrics['ssim'])),
+            'channels': {
+                key: channel_metrics[key].tolist()
+                for key in ('mse', 'psnr', 'ssim', 'histogram_js', 'lsb_js', 'lsb_change_rate')
+            }
         }
         
         return metrics
 
     def visualize_changes(self, original_image_path, stego_image_path):
         """Визуализирует различия с автоматической конвертацией форматов"""
-        original = np.array(Image.open(original_image_path))
-        stego = np.array(Image.open(stego_image_path))
-        
-        if len(original.shape) != len(stego.shape):
-            if len(original.shape) == 3:
-                stego = np.stack((stego,)*3, axis=-1)
-            else:
-                original = np.stack((original,)*3, axis=-1)
-        
-        changes = ((original & 1) != (stego & 1)).any(axis=-1 if len(original.shape) == 3 else None).astype(np.uint8) * 255
-        
-        highlight = np.zeros_like(original) if len(original.shape) == 3 else np.zeros((*original.shape, 3))
-        highlight[..., 0] = changes
-        if len(original.shape) == 3:
-            highlight[..., 1] = original[..., 1] // 2
-            highlight[..., 2] = original[..., 2] // 2
-        else:
-            highlight[..., 1] = original // 2
-            highlight[..., 2] = original // 2
+        original = self._load_pixels(original_image_path)
+        stego = self._load_pixels(stego_image_path)
         
-        return Image.fromarray(highlight.astype(np.uint8))
+        # Полутоновое изображение сравнивается с цветным через broadcast, без np.stack
+        return Image.fromarray(self._highlight(original, stego))
 
-    def analyze_lsb_distribution(self, block_size=8):
-        """Анализирует распределение LSB в блоках изображения"""
-        if len(self.pixels.shape) == 3:
-            lsb = self.pixels[:, :, 0] & 1
+    def analyze_lsb_distribution(self, block_size=8, edges="trim"):
+        """
+        Анализирует распределение LSB в блоках изображения по всем каналам
+        :param block_size: сторона квадратного блока
+        :param edges: "trim" — отбросить неполные блоки у правого и нижнего края,
+                      "pad" — учесть их, усредняя только по реальным пикселям
+        :return: матрица долей единичных LSB формы (строки, столбцы) для полутонового
+                 изображения или (строки, столбцы, каналы) для многоканального
+        """
+        lsb = self.pixels & 1
+        if lsb.ndim == 2:
+            lsb = lsb[..., None]
+        height, width, channels = lsb.shape
+        
+        if edges == "trim":
+            rows, cols = height // block_size, width // block_size
+            lsb = lsb[:rows * block_size, :cols * block_size]
+            counts = np.full((rows, cols), block_size * block_size)
+        elif edges == "pad":
+            rows, cols = -(-height // block_size), -(-width // block_size)
+            lsb = np.pad(lsb, ((0, rows * block_size - height), (0, cols * block_size - width), (0, 0)))
+            row_sizes = np.minimum(block_size, height - np.arange(rows) * block_size)
+            col_sizes = np.minimum(block_size, width - np.arange(cols) * block_size)
+            counts = np.outer(row_sizes, col_sizes)
         else:
-            lsb = self.pixels & 1
-        
-        height, width = lsb.shape[:2]
-        prob_matrix = np.zeros((height // block_size, width // block_size))
+            raise ValueError(f"Неизвестный режим обработки краёв: {edges}")
         
-        for i in range(0, height, block_size):
-            for j in range(0, width, block_size):
-                block = lsb[i:i+block_size, j:j+block_size]
-                prob_matrix[i//block_size, j//block_size] = np.mean(block)
+        # Разбиваем на блоки (rows, block, cols, block, channels) и суммируем внутри блоков
+        tiles = lsb.reshape(rows, block_size, cols, block_size, channels)
+        prob_matrix = tiles.sum(axis=(1, 3), dtype=np.uint32) / counts[..., None]
         
-        return prob_matrix  
+        return prob_matrix[..., 0] if channels == 1 else prob_matrix
 
-    def chi_square_test(self, block_size=64):
+    def _channel_planes(self):
+        """Возвращает список двумерных плоскостей каналов"""
+        if self.pixels.ndim == 2:
+            return [self.pixels]
+        return [self.pixels[..., c] for c in range(self.pixels.shape[2])]
+    
+    def _pairs_of_values(self, histograms, min_expected=5):
+        """
+        χ²-статистика Вестфельда по парам значений (2i, 2i+1) для строк массива гистограмм.
+        Категории с ожидаемой частотой меньше min_expected не учитываются.
+        :return: вероятность встраивания для каждой гистограммы
+        """
+        even = histograms[..., 0::2].astype(np.float64)
+        odd = histograms[..., 1::2]
+        expected = (even + odd) / 2
+        valid = expected >= min_expected
+        
+        safe_expected = np.where(valid, expected, 1)
+        chi_sq = np.where(valid, (even - expected) ** 2 / safe_expected, 0).sum(axis=-1)
+        degrees = valid.sum(axis=-1) - 1
+        return np.where(degrees > 0, chi2.sf(chi_sq, np.maximum(degrees, 1)), 0.0)
+    
+    def chi_square_curve(self, windows=100):
+        """
+        Атака Вестфельда χ² по нарастающей доле изображения для каждого канала.
+        Отсчёты канала читаются в порядке встраивания (построчно); для каждого из windows
+        окон строится гистограмма np.bincount, накопленные гистограммы дают кривую
+        вероятности встраивания за один проход по каналу.
+        :return: словарь с долями изображения 'fractions' (windows,), вероятностями
+                 встраивания 'p_values' (каналы, windows) и оценкой 'extent' — долей
+                 изображения, на которой вероятность встраивания превышает 0.5 во всех
+                 каналах (методы встраивания заполняют каналы вперемешку)
+        """
+        planes = self._channel_planes()
+        total = planes[0].size
+        window = -(-total // windows)
+        windows = -(-total // window)
+        
+        p_values = []
+        for plane in planes:
+            values = plane.reshape(-1)
+            histograms = np.stack([
+                np.bincount(values[i * window:(i + 1) * window], minlength=256)
+                for i in range(windows)
+            ])
+            p_values.append(self._pairs_of_values(np.cumsum(histograms, axis=0)))
+        p_values = np.array(p_values)
+        
+        fractions = np.minimum(np.arange(1, windows + 1) * window, total) / total
+        embedded = np.flatnonzero(p_values.min(axis=0) > 0.5)
+        extent = fractions[embedded[-1]] if embedded.size else 0.0
+        return {'fractions': fractions, 'p_values': p_values, 'extent': extent}
+    
+    def chi_square_test(self, sample_size=None):
         """
-        Выполняет χ²-тест для обнаружения стегосообщений
-        :param block_size: размер анализируемого блока (по умолчанию 64 бита)
+        Выполняет χ²-тест Вестфельда (пары значений) для обнаружения стегосообщений
+        по всем каналам изображения
+        :param sample_size: число первых отсчётов каждого канала для анализа (по умолчанию — все)
         :return: p-value - вероятность естественного распределения LSB
         """
-        if len(self.pixels.shape) == 3:
-            lsb = self.pixels[:, :, 0].flatten() & 1
-        else:
-            lsb = self.pixels.flatten() & 1
-        
-        lsb = lsb[:block_size]
-        
-        pairs = [(lsb[i], lsb[i+1]) for i in range(0, len(lsb)-1, 2)]
-        
-        freq = {
-            (0, 0): 0,
-            (0, 1): 0,
-            (1, 0): 0,
-            (1, 1): 0
-        }
-        
-        for pair in pairs:
-            freq[pair] += 1
-        
-        total_pairs = len(pairs)
-        if total_pairs == 0:
-            return 1.0 
-        
-        exp_freq = {
-            (0, 0): (freq[(0,0)] + freq[(0,1)]) * (freq[(0,0)] + freq[(1,0)]) / total_pairs,
-            (0, 1): (freq[(0,0)] + freq[(0,1)]) * (freq[(0,1)] + freq[(1,1)]) / total_pairs,
-            (1, 0): (freq[(1,0)] + freq[(1,1)]) * (freq[(0,0)] + freq[(1,0)]) / total_pairs,
-            (1, 1): (freq[(1,0)] + freq[(1,1)]) * (freq[(0,1)] + freq[(1,1)]) / total_pairs
-        }
-        
-        chi_sq = 0
-        for key in freq:
-            if exp_freq[key] != 0:
-                chi_sq += (freq[key] - exp_freq[key])**2 / exp_freq[key]
-        
-        from scipy.stats import chi2
-        p_value = 1 - chi2.cdf(chi_sq, df=1)
+        histogram = np.zeros(256, dtype=np.int64)
+        for plane in self._channel_planes():
+            histogram += np.bincount(plane.reshape(-1)[:sample_size], minlength=256)
         
-        return p_value
+        return 1.0 - float(self._pairs_of_values(histogram))
 
     def advanced_analysis(self):
         """Расширенный анализ с несколькими тестами"""
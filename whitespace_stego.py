@@ -0,0 +1,156 @@
+import io
+import re
+import numpy as np
+
+ZERO_WIDTH = '\u200b\u200c\u200d\u2060'  # ZWSP, ZWNJ, ZWJ, WORD JOINER
+# Промежуток — серия пробелов и табуляций, за которой может идти до двух невидимых символов;
+# слова — текст между промежутками, поэтому ZWJ/ZWNJ внутри слов (эмодзи, персидский, индийские
+# письменности) остаются на месте
+GAP_RE = re.compile(f'[ \\t]+[{ZERO_WIDTH}]{{0,2}}')
+HEADER_BITS = 32  # длина сообщения в байтах UTF-8
+
+# Алфавиты промежутков: символ с номером v кодирует log2(len) бит; символ 0 — обычный пробел
+ALPHABETS = {
+    'spaces': [' ', '  '],
+    'spaces4': [' ', '  ', '   ', '    '],
+    'tabs': [' ', '\t', '  ', ' \t', '\t ', '\t\t', '   ', '  \t'],
+    # Пробел и до двух невидимых символов после него: выглядит как одиночный пробел
+    'zero_width': [' ' + tail for tail in
+                   [''] + list(ZERO_WIDTH) + [first + second for first in ZERO_WIDTH for second in ZERO_WIDTH]][:16],
+}
+
+
+def bits_per_gap(alphabet: str) -> int:
+    return len(ALPHABETS[alphabet]).bit_length() - 1
+
+
+def message_symbols(message: str, alphabet: str) -> np.ndarray:
+    """
+    Номера символов алфавита для сообщения: 32-битная длина (в байтах UTF-8),
+    затем сами байты; последний символ дополняется нулевыми битами
+    """
+    data = message.encode('utf-8')
+    bits = np.unpackbits(np.frombuffer(len(data).to_bytes(HEADER_BITS // 8, 'big') + data, dtype=np.uint8))
+    width = bits_per_gap(alphabet)
+    bits = np.concatenate([bits, np.zeros(-len(bits) % width, dtype=np.uint8)])
+    return bits.reshape(-1, width) @ (1 << np.arange(width - 1, -1, -1))
+
+
+def split_line(line: str):
+    """
+    Отступ и слова строки (перевод строки отбрасывается). Отступ в начале строки
+    сохраняется как есть и промежутком не считается, пробелы в конце строки отбрасываются.
+    """
+    body = line.rstrip('\r\n')
+    start = GAP_RE.match(body)
+    indent = start.group() if start else ''
+    words = GAP_RE.split(body[len(indent):])
+    if words[-1] == '':
+        words.pop()
+    return indent, words
+
+
+def line_slots(words: int, trailing: bool) -> int:
+    """Промежутки строки: между словами и, если trailing, после последнего слова"""
+    if words == 0:
+        return 0
+    return words - 1 + int(trailing)
+
+
+def capacity_bits(lines, alphabet: str = 'spaces4', trailing: bool = False) -> int:
+    """Емкость контейнера в битах (включая 32 бита заголовка)"""
+    slots = sum(line_slots(len(split_line(line)[1]), trailing) for line in lines)
+    return slots * bits_per_gap(alphabet)
+
+
+def embed_lines(lines, message: str, alphabet: str = 'spaces4', trailing: bool = False):
+    """
+    Встраивает сообщение в промежутки между словами, обрабатывая строки по одной.
+    Каждый промежуток — символ алфавита ALPHABETS[alphabet], несущий несколько бит;
+    при trailing дополнительный символ ставится в конце каждой непустой строки.
+    Разбиение строк, отступы и сами слова сохраняются, после сообщения промежутки — одиночные пробелы.
+    Строки собираются через join, поэтому время линейно по размеру текста.
+    Если промежутков не хватило, после последней строки выбрасывается ValueError.
+    """
+    gaps = ALPHABETS[alphabet]
+    symbols = message_symbols(message, alphabet)
+    position = 0
+    for line in lines:
+        indent, words = split_line(line)
+        ending = line[len(line.rstrip('\r\n')):]
+        slots = line_slots(len(words), trailing)
+        line_gaps = [gaps[value] for value in symbols[position:position + slots]]
+        position += len(line_gaps)
+        line_gaps += [' '] * (len(words) - 1 - len(line_gaps))
+        parts = [None] * (len(words) + len(line_gaps))
+        parts[0::2] = words
+        parts[1::2] = line_gaps
+        yield indent + ''.join(parts) + ending
+    if position < len(symbols):
+        raise ValueError(f"Текст слишком короткий для встраивания сообщения: "
+                         f"нужно {len(symbols)} промежутков, доступно {position}")
+
+
+def _symbols_to_bytes(symbols, width: int, bit_count: int) -> bytes:
+    values = np.asarray(symbols, dtype=np.uint8)[:, None]
+    bits = np.unpackbits(values, axis=1)[:, 8 - width:].reshape(-1)
+    return np.packbits(bits[:bit_count]).tobytes()
+
+
+def extract_lines(lines, alphabet: str = 'spaces4'):
+    """
+    Извлечение за один линейный проход: серии промежутков каждой строки (re.finditer)
+    переводятся в номера символов алфавита; чтение прекращается, как только получено
+    столько бит, сколько указано в заголовке длины.
+    :return: сообщение или None, если текст кончился раньше
+    """
+    values = {gap: value for value, gap in enumerate(ALPHABETS[alphabet])}
+    width = bits_per_gap(alphabet)
+    symbols = []
+    length = None
+    needed = -(-HEADER_BITS // width)
+    for line in lines:
+        for run in GAP_RE.finditer(line):
+            if run.start() == 0:
+                continue  # отступ строки не несет данных
+            value = values.get(run.group())
+            if value is None:
+                raise ValueError(f"Промежуток {run.group()!r} не входит в алфавит {alphabet}")
+            symbols.append(value)
+        if length is None and len(symbols) >= needed:
+            length = int.from_bytes(_symbols_to_bytes(symbols, width, HEADER_BITS), 'big')
+            needed = -(-(HEADER_BITS + 8 * length) // width)
+        if length is not None and len(symbols) >= needed:
+            data = _symbols_to_bytes(symbols[:needed], width, HEADER_BITS + 8 * length)
+            return data[HEADER_BITS // 8:].decode('utf-8', errors='replace')
+    return None
+
+
+def embed_text(cover: str, message: str, alphabet: str = 'spaces4', trailing: bool = False) -> str:
+    # StringIO делит текст на строки так же, как файл, открытый с newline=''
+    return ''.join(embed_lines(io.StringIO(cover, newline=''), message, alphabet, trailing))
+
+
+def extract_text(stego: str, alphabet: str = 'spaces4'):
+    return extract_lines(io.StringIO(stego, newline=''), alphabet)
+
+
+def embed_file(cover_path: str, output_path: str, message: str, alphabet: str = 'spaces4', trailing: bool = False):
+    """
+    Встраивание в текстовый файл потоком строк: файл читается дважды (подсчет
+    емкости и запись), но целиком в память не загружается.
+    """
+    required = len(message_symbols(message, alphabet)) * bits_per_gap(alphabet)
+    with open(cover_path, 'r', encoding='utf-8') as cover:
+        available = capacity_bits(cover, alphabet, trailing)
+    if available < required:
+        raise ValueError(f"Текст слишком короткий для встраивания сообщения: нужно {required} бит, доступно {available}")
+    with open(cover_path, 'r', encoding='utf-8', newline='') as cover, \
+            open(output_path, 'w', encoding='utf-8', newline='') as output:
+        output.writelines(embed_lines(cover, message, alphabet, trailing))
+
+
+def extract_file(stego_path: str, alphabet: str = 'spaces4'):
+    """Извлечение из текстового файла потоком строк; чтение прекращается, когда сообщение получено"""
+    with open(stego_path, 'r', encoding='utf-8', newline='') as stego:
+        return extract_lines(stego, alphabet)